@@ -10,36 +10,88 @@
 #                                / XI.2024 - add/disable legend (default disabled)
 #
 #                                TO FIX:
-#                                -r not working with -n
-#                                -different marker sizes for additional columns, e.g. by using uc (u colormap 1:2) - done. FIX: legend values
-#                                -color map 
+#                                -different marker sizes for additional columns, e.g. by using uc (u colormap 1:2) - done
 #
-#                                TO DO:
-#                                -refresh the plot
-#                                -multiuse - mu 1:2:3:4 to plot 1:2, 1:3, 1:4, so on... (???)
-#
-# Requirements: mesa-reader, history.data and/or profiles.data files 
+# Requirements: numpy, matplotlib, history.data and/or profiles.data files 
 
-import mesa_reader as mesa
-import numpy as np
-import glob
 import sys
 import os
+import ast
+import json
+import hashlib
+import importlib
+import operator
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 os.environ['PYTHONWARNINGS'] = 'ignore'
-import matplotlib.pyplot as plt
-import curses
 
-from matplotlib.ticker import FormatStrFormatter, AutoMinorLocator
+class LazyModule:
+    """
+        Stand-in for a module that is imported on the first attribute access, so that the
+        help and the -n column listing start without importing numpy and matplotlib.
 
-try:
-    # requires mactex on Mac,  
-    # brew install --cask mactex 
-    import scienceplots
-    plt.style.use(['science', 'std-colors'])
-    # plt.rcParams['text.latex.preamble'] = r'\usepackage{sfmath} \boldmath'
-    # plt.rcParams('font', weight='bold')
-except:
-    pass
+        Parameters:
+            name:           name of the module
+            setup:          function called with the module once it is imported
+    """
+    def __init__(self, name, setup=None):
+        self._name = name
+        self._setup = setup
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            module = importlib.import_module(self._name)
+            if self._setup is not None:
+                self._setup(module)
+            self._module = module
+        return getattr(self._module, attr)
+
+def setup_style(plt):
+    """
+        Apply the SciencePlots style, if installed, once matplotlib.pyplot is imported.
+        The style files are remembered in cache_dir/style.json, so the next runs apply
+        them directly instead of importing scienceplots, which reads all its styles.
+    """
+    import matplotlib
+    styles = ['science', 'std-colors']
+    stamp = os.path.join(cache_dir, 'style.json')
+    try:
+        with open(stamp, 'r') as f:
+            cached = json.load(f)
+        if cached['matplotlib'] == matplotlib.__version__ and all(os.path.isfile(path) for path in cached['styles']):
+            plt.style.use(cached['styles'])
+            return
+    except (OSError, ValueError, KeyError):
+        pass
+
+    try:
+        # requires mactex on Mac,  
+        # brew install --cask mactex 
+        import scienceplots
+        plt.style.use(styles)
+        # plt.rcParams['text.latex.preamble'] = r'\usepackage{sfmath} \boldmath'
+        # plt.rcParams('font', weight='bold')
+    except:
+        return
+
+    paths = {}
+    for root, dirs, files in os.walk(os.path.dirname(scienceplots.__file__)):
+        for name in styles:
+            if name + '.mplstyle' in files:
+                paths.setdefault(name, os.path.join(root, name + '.mplstyle'))
+    if len(paths) < len(styles):
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(stamp, 'w') as f:
+            json.dump({'matplotlib': matplotlib.__version__, 'styles': [paths[name] for name in styles]}, f)
+    except OSError:
+        pass
+
+np = LazyModule('numpy')
+plt = LazyModule('matplotlib.pyplot', setup=setup_style)
 
 ### Initialise rcParams ###
 ###########################
@@ -74,120 +126,1119 @@ include_legend = True
 
 multiplicator = 1 # 86400
 
+color_map = 'inferno' # colormap of the uc mode
+
+profile_cache_size = 64 # number of parsed profiles kept in memory while stepping through them
 
+# binary column cache of the parsed .data files, invalidated on file size/mtime change
+cache_dir = os.environ.get('MESAPLOT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'MESAplot'))
 
-####### HELP ########
+
+
+##### Functions #####
 #####################
-if len(sys.argv) < 3:
-   print('\n    MESA-plotter  \n')
-   print('      plot opt[u x:y] [lc[x,y]] \n')
-   print('      lc               filename of your light curve containing at least 2 columns ')
-   print('                       You can pass as many files to plot as you wish ')
-   print('      <u x:y:z>        specify the column numbers to plot ')
-   # print('       us              use size map -> plot the last column using size map ') # not working with -wl as default
-   # print('      <mu x1:y1 x2:x2> (optional) specify multiple column numbers to plot <devel option!>')
-   print('      -r               pass only the directory and look for any LOGS*/history.data files therein to plot ') 
-   print('      -n               name module will print availlable data column names ')
-   print('      -c               add cross hair cursor to the plot ')
-   print('      -l / -/l         add / disable legend (disabled by default)')
-   print('      -wl/wp/wlp       plot using lines [default], points, lines and points, respectively')
-   print('      -xlog/ylog       adds log scale on a given axis')
-   print('      -ylim            in multiple plot mode (plotting 3 variables) set y twin ax lim same as primary y ax lim')
-   print('      -save=fname      save plot under the fname.extension. If no extension provided default to ".png" ')
-   print('')
-   exit()
 
+def try_float(num):
+    """
+        Routine that checks if the passed via terminal command is float of not. 
 
+        Parameters:
+            num:     any type
+        
+        Returns:
+            True/False
+    """
 
+    try:
+        float(num)
+        return True
+    except ValueError:
+        return False
 
-### Initialise plot ###
-#######################
-fig, ax1 = plt.subplots(1, 1, figsize=(12,7))
+### Data loader ###
+###################
+# MESA .data layout: line 2 holds the header names, line 3 their values,
+# line 6 the column names and the column block starts at line 7
+header_names_line = 2
+bulk_names_line = 6
 
+# files larger than stream_min_size bytes (or all the files with -stream) are parsed in chunks of
+# stream_chunk_size bytes and cut down to at most stream_max_rows rows on the way, see RowReducer
+stream_min_size = 2**30
+stream_chunk_size = 2**26
+stream_max_rows = 500000
 
+def read_header(file):
+    """
+        Read the header block of a MESA .data file, stopping at the column-name row.
 
+        Parameters:
+            file:           path to the MESA .data file
 
+        Returns:
+            header_names:   list of the header (global) names
+            header_data:    dictionary of the header values
+            bulk_names:     tuple of the column names
+    """
+    with open(str(file), 'r') as f:
+        for _ in range(header_names_line - 1):
+            f.readline()
+        header_names = f.readline().split()
+        header_values = f.readline().split()
+        for _ in range(bulk_names_line - header_names_line - 2):
+            f.readline()
+        bulk_names = tuple(f.readline().split())
+
+    header_data = {}
+    for name, value in zip(header_names, header_values):
+        try:
+            header_data[name] = float(value) if not value.lstrip('-').isdigit() else int(value)
+        except ValueError:
+            header_data[name] = value.strip('"')
+    return header_names, header_data, bulk_names
+
+### Column cache ###
+####################
+# Every parsed column is stored as a separate .npy file in cache_dir/<hash of the path>/,
+# next to a stamp.json holding the path, size and mtime of the source file. Cached
+# columns are memory-mapped, so a repeated plot of the same LOGS does not parse anything.
+
+class ColumnCache:
+    """
+        On-disk cache of the columns of a single MESA .data file.
+    """
+    def __init__(self, file, directory=None):
+        file = os.path.abspath(str(file))
+        if directory is None:
+            directory = cache_dir
+        self.path = os.path.join(directory, hashlib.sha1(file.encode()).hexdigest()[:20])
 
-# # load file list and pick up only those to plot
-# file_list = []  
-# for i in range(len(sys.argv)):
-#     if os.path.exists(sys.argv[i]):
-#         file_list.append(sys.argv[i])
-# # delete posibble duplicates
-# file_list = list(set(file_list))
+        stat = os.stat(file)
+        self.stamp = {'path': file, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
 
+        try:
+            with open(os.path.join(self.path, 'stamp.json'), 'r') as f:
+                valid = json.load(f) == self.stamp
+        except (OSError, ValueError):
+            valid = False
+        if not valid:
+            self.invalidate()
+
+    def invalidate(self):
+        """
+            Remove the cached columns and stamp the cache with the current state of the file.
+        """
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            for name in os.listdir(self.path):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.path, name))
+            with open(os.path.join(self.path, 'stamp.json'), 'w') as f:
+                json.dump(self.stamp, f)
+        except OSError:
+            pass
 
-# global numer_of_files
-# numer_of_files = -1 # -1 to account for calling the program, which is sys.argv[0]
-# for i in range(len(sys.argv)):
-#     if os.path.exists(sys.argv[i]):
-#            file_to_plot = sys.argv[i]
-#            numer_of_files += 1
+    def _column_file(self, index):
+        return os.path.join(self.path, '{}.npy'.format(index))
 
+    def get(self, index):
+        """
+            Memory-mapped cached column, or None if it is not cached.
+        """
+        try:
+            return np.load(self._column_file(index), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def has(self, index):
+        """
+            Check whether the column is cached.
+        """
+        return os.path.isfile(self._column_file(index))
+
+    def put(self, index, values):
+        """
+            Store the column, written under a temporary name first so that concurrent
+            readers never see a partial file.
+        """
+        tmp_file = self._column_file(index) + '.{}.tmp'.format(os.getpid())
+        try:
+            with open(tmp_file, 'wb') as f:
+                np.save(f, np.ascontiguousarray(values))
+            os.replace(tmp_file, self._column_file(index))
+        except OSError:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
+# row conditions of -where and -range, e.g. center_h1<1e-4 or star_age>=1e9
+row_comparisons = {'<=': operator.le, '>=': operator.ge, '==': operator.eq, '!=': operator.ne, '<': operator.lt, '>': operator.gt}
+
+def parse_condition(condition):
+    """
+        Split a row condition like center_h1<1e-4 or 2>=1e9 (column number) into its parts.
 
-# Load file list and pick up only those to plot
-file_list = []
-to_remove = []  # Arg list to remove from sys.argv
+        Returns:
+            column key, comparison (a key of row_comparisons) and value
+    """
+    import re
+    match = re.fullmatch(r'\s*(.+?)\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*', str(condition))
+    if match is None or not try_float(match.group(3)):
+        raise ValueError('cannot parse the row condition "{}", expected e.g. center_h1<1e-4'.format(condition))
+    key, comparison, value = match.groups()
+    return int(float(key)) if try_float(key) else key, comparison, float(value)
+
+def range_conditions(selection):
+    """
+        Row conditions of a range like model_number:100:500 (inclusive), either bound may be
+        left out, e.g. star_age:1e9: for the rows from the age of 1 Gyr on.
 
-for i in range(len(sys.argv)):
-    if i == 0:
-        # Discard the firts argument as being a path to program
-        to_remove.append(sys.argv[i])
-        continue
+        Returns:
+            list of condition strings
+    """
+    parts = str(selection).split(':')
+    if len(parts) != 3 or not parts[0]:
+        raise ValueError('cannot parse the row range "{}", expected e.g. model_number:100:500'.format(selection))
+    key, lower, upper = parts
+    return ([key + '>=' + lower] if lower else []) + ([key + '<=' + upper] if upper else [])
 
-    if os.path.exists(sys.argv[i]):
-        file_list.append(sys.argv[i])
-        to_remove.append(sys.argv[i])  
+class Expression:
+    """
+        Derived column like 10**log_L/10**log_R**2 or log10(star_mdot): arithmetic on the
+        columns (by name), numbers, pi, e and the NumPy ufuncs (log10, sqrt, abs, ...).
 
-# delete posibble duplicates
-file_list = list(set(file_list))
-file_list.sort()
-# remove to_remove from sys.argv
-sys.argv = [arg for arg in sys.argv if arg not in to_remove]
+        The expression is parsed and compiled once into vectorized steps, one per distinct
+        subexpression, in the order of evaluation. evaluate() stores the result of every step
+        under the dump of its AST in a memo kept by the table, so that a subexpression shared
+        by the expressions of a plot (e.g. 10**log_L) is computed once per file.
+    """
+    operators = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+                 ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+                 ast.USub: operator.neg, ast.UAdd: operator.pos}
+    constants = ('pi', 'e')
+
+    def __init__(self, text):
+        self.text = str(text).strip()
+        self.names = []     # columns used
+        self.steps = []     # (key, function, argument keys), function None for a column
+        try:
+            tree = ast.parse(self.text, mode='eval')
+        except SyntaxError:
+            raise ValueError('cannot parse the column expression "{}"'.format(self.text))
+        self.key = self._compile(tree.body, set())
+        if not self.names:
+            raise ValueError('the column expression "{}" uses no column'.format(self.text))
+
+    def _compile(self, node, seen):
+        key = ast.dump(node)
+        if key in seen:
+            return key
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            step = (key, lambda value=float(node.value): value, [])
+        elif isinstance(node, ast.Name) and node.id in self.constants:
+            step = (key, lambda name=node.id: getattr(np, name), [])
+        elif isinstance(node, ast.Name):
+            self.names.append(node.id)
+            step = (key, None, [node.id])
+        elif isinstance(node, ast.BinOp) and type(node.op) in self.operators:
+            step = (key, self.operators[type(node.op)], [self._compile(node.left, seen), self._compile(node.right, seen)])
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in self.operators:
+            step = (key, self.operators[type(node.op)], [self._compile(node.operand, seen)])
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords and \
+                isinstance(getattr(np, node.func.id, None), np.ufunc):
+            step = (key, getattr(np, node.func.id), [self._compile(arg, seen) for arg in node.args])
+        else:
+            raise ValueError('unsupported column expression "{}", only arithmetic and NumPy functions like log10() are allowed'.format(self.text))
+        seen.add(key)
+        self.steps.append(step)
+        return key
+
+    def evaluate(self, table, memo):
+        """
+            Values of the expression over the columns of table.
+
+            Parameters:
+                table:      MesaTable object
+                memo:       dictionary of the results of the steps evaluated on this table so far
+        """
+        with np.errstate(all='ignore'):
+            for key, function, arguments in self.steps:
+                if key in memo:
+                    continue
+                if function is None:
+                    memo[key] = table.column(arguments[0])
+                else:
+                    memo[key] = function(*[memo[argument] for argument in arguments])
+        return memo[self.key]
 
-# Chech if '-r' i '-n' exist in sys.argv. Sort them if they do, so -n option will know that 
-# it has to search recursively for LOGS*/*.data files!
-if '-n' in sys.argv and '-r' in sys.argv:
-    if sys.argv.index('-r') > sys.argv.index('-n'):
-        r_index = sys.argv.index('-r')
-        n_index = sys.argv.index('-n')
-        sys.argv[r_index], sys.argv[n_index] = sys.argv[n_index], sys.argv[r_index]
+compiled_expressions = {} # expression text -> Expression object, shared by all the files
 
+def is_expression(key):
+    """
+        Check whether a column key is an expression rather than a column number or name.
+    """
+    return isinstance(key, str) and not key.isidentifier() and not try_float(key)
 
-##### Functions #####
-#####################
+def compile_expression(text):
+    """
+        Expression object of text, compiled on first use only.
+    """
+    if text not in compiled_expressions:
+        compiled_expressions[text] = Expression(text)
+    return compiled_expressions[text]
 
-def try_float(num):
+class RowReducer:
     """
-        Routine that checks if the passed via terminal command is float of not. 
+        Running reducer of the streaming reader. The rows of a file are fed chunk by chunk and
+        whenever more than max_rows are held, they are cut down to the rows holding the
+        minimum and maximum of every column in each stretch of rows (see decimate()). The
+        extremes of all the columns survive, so the axis limits and the size-map and colour
+        ranges computed from the reduced rows are exact.
 
         Parameters:
-            num:     any type
-        
+            ncols:          number of columns fed
+            max_rows:       number of rows held at most, stream_max_rows by default
+    """
+    def __init__(self, ncols, max_rows=None):
+        self.max_rows = stream_max_rows if max_rows is None else max_rows
+        self._parts = [[np.empty(0)] for _ in range(ncols)]
+        self._nrows = 0
+
+    def feed(self, columns):
+        """
+            Add the rows of a chunk, given as a list of columns.
+        """
+        for part, values in zip(self._parts, columns):
+            part.append(values)
+        self._nrows += len(columns[0])
+        if self._nrows > self.max_rows:
+            columns = self.columns()
+            n_buckets = max(self.max_rows // (4*len(columns)), 1)
+            keep = decimate(columns[0], columns[min(1, len(columns)-1)], n_buckets, extra=columns[2:])
+            if keep is not None:
+                self.keep(keep)
+
+    def keep(self, rows):
+        """
+            Keep only the rows held at the indices or boolean mask rows.
+        """
+        columns = [values[rows] for values in self.columns()]
+        self._parts = [[values] for values in columns]
+        self._nrows = len(columns[0])
+
+    def columns(self):
+        """
+            Columns of the rows held.
+        """
+        for i, part in enumerate(self._parts):
+            if len(part) > 1:
+                self._parts[i] = [np.concatenate(part)]
+        return [part[0] for part in self._parts]
+
+class MesaTable:
+    """
+        Column store for a single MESA .data file. The header is parsed once and the
+        columns are then served both by their number (as passed via u x:y, counting
+        from 1) and by their name.
+
+        Only the columns asked for are parsed and kept in memory (column projection):
+        the requested names/numbers are resolved against the column-name row first,
+        and any column requested later is parsed on demand.
+
+        Indexing with [] follows the np.loadtxt(..., unpack=True) convention
+        (p[0] is the first column), attribute access follows mesa_reader
+        (p.star_age), so both access styles keep working.
+
+        A streamed table holds the rows of the file reduced by a RowReducer instead, parsed
+        in bounded memory. Loading another column streams the file again.
+
+        Column keys may also be expressions of the columns, e.g. 10**log_L/10**log_R**2,
+        see Expression.
+
+        With where, only the rows matching all the conditions are kept. The filter columns
+        are parsed first, and a condition on a column sorted either way is turned into a
+        range of rows by binary search, so that the other columns are parsed within that
+        range only.
+    """
+    def __init__(self, file, columns=None, cache=False, stream=None, where=None):
+        self.file_name = str(file)
+        self.header_names, self.header_data, self.bulk_names = read_header(file)
+        self._index = {name: i for i, name in enumerate(self.bulk_names)}
+        self._columns = {}  # column index -> values
+        self._keep = None   # rows kept after removing backups, None if all of them
+        self._nrows = None  # number of rows in the file, backups included
+        self._offset = None # byte offset of the first row not parsed yet, see update()
+        self._window = None # range of the rows of the file holding the rows selected by where
+        self._derived = {}  # memo of the expressions, see Expression.evaluate()
+        self._where = [parse_condition(condition) if isinstance(condition, str) else tuple(condition) for condition in where] if where else None
+        self._size = os.path.getsize(self.file_name)
+        self._cache = None
+        # stream the files too large to hold, unless told otherwise
+        self._stream = self._size > stream_min_size if stream is None else stream
+        if cache and not self._stream:
+            try:
+                self._cache = ColumnCache(self.file_name)
+            except OSError:
+                pass
+
+        if columns is None:
+            columns = self.bulk_names
+        self.load(columns)
+
+    def load(self, keys):
+        """
+            Parse the requested columns that are not loaded yet, in a single pass over the file.
+
+            Parameters:
+                keys:       list of column numbers (counting from 1) and/or column names
+        """
+        indices = {self.col_index(name) for key in keys for name in self._names(key)}
+        if not self._columns:
+            first = set()
+            # model_number is needed to drop the backups, so parse it along with the first columns
+            if 'model_number' in self._index:
+                first.add(self._index['model_number'])
+            if self._where:
+                first |= {self.col_index(key) for key, comparison, value in self._where}
+                if not self._stream:
+                    # select the rows on the filter columns, the others are parsed within them
+                    self._parse(sorted(first))
+                    self._select()
+            indices |= first
+        indices = sorted(indices - set(self._columns))
+        if not indices:
+            return
+        if self._stream:
+            self._load_stream(sorted(set(self._columns) | set(indices)))
+            return
+        self._parse(indices)
+
+    def _names(self, key):
+        # columns needed for a column key
+        return compile_expression(key).names if is_expression(key) else [key]
+
+    def _parse(self, indices):
+        """
+            Parse the columns (counting from 0) within the rows selected so far, from the
+            on-disk cache if possible.
+        """
+        start, stop = self._window or (0, self._nrows)
+        raw_columns = {}
+        if self._cache is not None:
+            for index in indices:
+                values = self._cache.get(index)
+                if values is not None:
+                    raw_columns[index] = values[start:stop]
+
+        to_parse = [index for index in indices if index not in raw_columns]
+        if to_parse and stop is not None and stop <= start:
+            # no row selected
+            raw_columns.update((index, np.empty(0)) for index in to_parse)
+        elif to_parse:
+            # stop at the rows known so far, the file may be growing (see update())
+            bulk_data = np.loadtxt(self.file_name, skiprows=bulk_names_line + start, usecols=to_parse, ndmin=2, unpack=True,
+                                   max_rows=None if stop is None else stop - start)
+            for index, values in zip(to_parse, bulk_data):
+                raw_columns[index] = values
+                # only the whole columns are cached
+                if self._cache is not None and self._window is None:
+                    self._cache.put(index, values)
+
+        if not self._columns:
+            self._nrows = len(raw_columns[indices[0]])
+            if 'model_number' in self._index:
+                self._keep = self._backups_mask(raw_columns[self._index['model_number']])
+        for index in indices:
+            values = raw_columns[index]
+            self._columns[index] = values if self._keep is None else values[self._keep]
+
+    def _select(self):
+        """
+            Narrow the rows down to those matching the conditions of where. A condition on a
+            monotonic column gives a range of rows found by np.searchsorted, the others a mask.
+            The range of the rows of the file holding the selected rows is kept in _window.
+        """
+        n = len(self._columns[next(iter(self._columns))])
+        start, stop = 0, n
+        mask = np.ones(n, dtype=bool)
+        for key, comparison, value in self._where:
+            values = self._columns[self.col_index(key)]
+            if comparison not in ('==', '!=') and n > 1:
+                ascending = np.all(values[1:] >= values[:-1])
+                if not ascending and np.all(values[1:] <= values[:-1]):
+                    # a decreasing column (e.g. center_h1) is searched as an increasing one
+                    values, value = -values, -value
+                    comparison = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}[comparison]
+                    ascending = True
+                if ascending:
+                    side = 'left' if comparison in ('<', '>=') else 'right'
+                    row = int(np.searchsorted(values, value, side=side))
+                    if comparison in ('>', '>='):
+                        start = max(start, row)
+                    else:
+                        stop = min(stop, row)
+                    continue
+            mask &= row_comparisons[comparison](values, value)
+        stop = max(start, stop)
+        selected = np.arange(start, stop)[mask[start:stop]]
+
+        # selected rows as rows of the file
+        rows = np.arange(self._nrows) if self._keep is None else np.flatnonzero(self._keep)
+        self._set_window(rows[selected])
+        for index in self._columns:
+            self._columns[index] = self._columns[index][selected]
+
+    def _selected_rows(self):
+        # rows of the file held by a table filtered by where
+        start, stop = self._window
+        return start + (np.arange(stop - start) if self._keep is None else np.flatnonzero(self._keep))
+
+    def _set_window(self, rows):
+        # the rows of the file between the first and the last selected row, and the selected ones among them
+        window_start, window_stop = (int(rows[0]), int(rows[-1]) + 1) if len(rows) else (0, 0)
+        keep = np.zeros(window_stop - window_start, dtype=bool)
+        keep[rows - window_start] = True
+        self._window = (window_start, window_stop)
+        self._keep = None if keep.all() else keep
+
+    def _load_stream(self, indices):
+        """
+            Parse the columns in chunks of stream_chunk_size bytes, holding only the rows kept
+            by a RowReducer. Rows superseded by a backup restart are dropped chunk by chunk.
+        """
+        reducer = RowReducer(len(indices))
+        self._derived = {}
+        model_number_index = self._index.get('model_number')
+        position = indices.index(model_number_index) if model_number_index in indices else None
+        conditions = [(indices.index(self.col_index(key)), row_comparisons[comparison], value) for key, comparison, value in self._where or []]
+        with open(self.file_name, 'rb') as f:
+            for _ in range(bulk_names_line):
+                f.readline()
+            offset = f.tell()
+            while True:
+                lines = f.readlines(stream_chunk_size)
+                if lines and not lines[-1].endswith(b'\n'):
+                    # a row that is still being written is left for update()
+                    lines.pop()
+                if not lines:
+                    break
+                offset += sum(len(line) for line in lines)
+                chunk = np.loadtxt(lines, usecols=indices, ndmin=2, unpack=True)
+                if position is not None and len(chunk[position]):
+                    model_number = chunk[position]
+                    reducer.keep(reducer.columns()[position] < model_number.min())
+                    mask = self._backups_mask(model_number)
+                    if mask is not None:
+                        chunk = chunk[:, mask]
+                if conditions:
+                    mask = np.ones(chunk.shape[1], dtype=bool)
+                    for column, comparison, value in conditions:
+                        mask &= comparison(chunk[column], value)
+                    chunk = chunk[:, mask]
+                reducer.feed(list(chunk))
+
+        self._columns = dict(zip(indices, reducer.columns()))
+        self._nrows = len(self._columns[indices[0]])
+        self._keep = None
+        self._offset = offset
+
+    def update(self):
+        """
+            Parse the rows appended to the file since it was loaded (tail-follow of a running
+            model). Only the bytes past the last parsed row are read, and only the loaded
+            columns are extended. The row conditions of where are applied to the new rows.
+
+            Returns:
+                number of new rows
+        """
+        self._derived = {}
+        if os.path.getsize(self.file_name) < (self._offset or 0):
+            # file rewritten from scratch (e.g. the run was restarted), load it again
+            indices = sorted(self._columns)
+            state = self._columns, self._keep, self._nrows, self._offset, self._window, self._cache
+            self._columns, self._keep, self._nrows, self._offset, self._window, self._cache = {}, None, None, None, None, None
+            try:
+                self.load([index + 1 for index in indices])
+            except Exception:
+                # e.g. a row still being written, the table is kept as it was until the next call
+                self._columns, self._keep, self._nrows, self._offset, self._window, self._cache = state
+                raise
+            self._size = os.path.getsize(self.file_name)
+            return self._nrows
+
+        with open(self.file_name, 'rb') as f:
+            if self._offset is None:
+                # first call, skip the header and the rows loaded so far
+                for _ in range(bulk_names_line + self._nrows):
+                    f.readline()
+                self._offset = f.tell()
+            f.seek(self._offset)
+            new_data = f.read()
+
+        # a row that is still being written is left for the next call
+        end = new_data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        self._offset += end
+        lines = [line for line in new_data[:end].decode().splitlines() if line.strip()]
+        if not lines:
+            return 0
+
+        # the cached columns no longer describe the file
+        self._cache = None
+
+        indices = sorted(self._columns)
+        new_columns = dict(zip(indices, np.loadtxt(lines, usecols=indices, ndmin=2, unpack=True)))
+
+        new_keep = np.ones(len(lines), dtype=bool)
+        superseded = np.zeros(len(self._columns[indices[0]]), dtype=bool)
+        if 'model_number' in self._index:
+            model_number = new_columns[self._index['model_number']]
+            # a restart from a backup supersedes the loaded rows with the same or later model_number
+            superseded = self._columns[self._index['model_number']] >= model_number.min()
+            mask = self._backups_mask(model_number)
+            if mask is not None:
+                new_keep = mask
+        if self._where:
+            # the conditions are applied to the new rows only, the rows selected so far stay selected
+            for key, comparison, value in self._where:
+                new_keep &= row_comparisons[comparison](new_columns[self.col_index(key)], value)
+
+        if self._where and not self._stream:
+            rows = self._selected_rows()[~superseded]
+            self._set_window(np.concatenate([rows, self._nrows + np.flatnonzero(new_keep)]))
+        else:
+            keep = np.ones(self._nrows, dtype=bool) if self._keep is None else self._keep
+            keep[np.flatnonzero(keep)[superseded]] = False
+            keep = np.concatenate([keep, new_keep])
+            self._keep = None if keep.all() else keep
+
+        for index in indices:
+            old_values = self._columns[index]
+            if superseded.any():
+                old_values = old_values[~superseded]
+            self._columns[index] = np.concatenate([old_values, new_columns[index][new_keep]])
+
+        self._nrows += len(lines)
+        self._size = os.path.getsize(self.file_name)
+        if self._stream:
+            # the streamed table holds the kept rows only, reduced again once there are too many
+            indices = sorted(self._columns)
+            reducer = RowReducer(len(indices))
+            reducer.feed([self._columns[index] for index in indices])
+            self._columns = dict(zip(indices, reducer.columns()))
+            self._nrows = len(self._columns[indices[0]])
+            self._keep = None
+        if self._where:
+            return int(new_keep.sum() + superseded.sum())
+        return len(lines)
+
+    def _backups_mask(self, model_number):
+        """
+            Rows superseded by a later backup/restart are dropped, i.e. a row is kept only if its
+            model_number is smaller than every model_number that follows (as mesa_reader does).
+
+            Returns:
+                boolean mask of the rows to keep or None if all rows are kept
+        """
+        if len(model_number) < 2:
+            return None
+        suffix_min = np.minimum.accumulate(model_number[::-1])[::-1]
+        keep = np.ones(len(model_number), dtype=bool)
+        keep[:-1] = model_number[:-1] < suffix_min[1:]
+        if keep.all():
+            return None
+        return keep
+
+    def col_index(self, key):
+        """
+            Resolve a column key into its position in bulk_names.
+
+            Parameters:
+                key:        column number as passed via terminal (counting from 1, the sign
+                            only marks an inverted axis) or column name
+
+            Returns:
+                index of the column (counting from 0)
+        """
+        if not isinstance(key, str) or try_float(key):
+            index = abs(int(float(key))) - 1
+            if not 0 <= index < len(self.bulk_names):
+                raise IndexError('column {} not found in {}'.format(key, self.file_name))
+            return index
+        try:
+            return self._index[key]
+        except KeyError:
+            raise KeyError('column "{}" not found in {}'.format(key, self.file_name))
+
+    def name(self, key):
+        """
+            Column name for a column number or name, the expression itself for an expression.
+        """
+        if is_expression(key):
+            return compile_expression(key).text
+        return self.bulk_names[self.col_index(key)]
+
+    def in_data(self, key):
+        """
+            Check whether the column is available.
+        """
+        try:
+            for name in self._names(key):
+                self.col_index(name)
+            return True
+        except (IndexError, KeyError, ValueError):
+            return False
+
+    def column(self, key):
+        """
+            Column values for a column number or name, parsed on first use, or the values of
+            an expression of the columns.
+        """
+        if is_expression(key):
+            return compile_expression(key).evaluate(self, self._derived)
+        index = self.col_index(key)
+        if index not in self._columns:
+            self.load([index + 1])
+        return self._columns[index]
+
+    def __getitem__(self, index):
+        return self.column(index + 1)
+
+    def __len__(self):
+        return len(self.bulk_names)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._index:
+            return self.column(name)
+        if name in self.header_data:
+            return self.header_data[name]
+        raise AttributeError(name)
+
+def load_data(file, columns=None, cache=True, stream=None, where=None):
+    """
+        Load a MESA .data file (history or profile) once for all plot modes.
+
+        Parameters:
+            file:           path to the MESA .data file
+            columns:        list of column numbers (counting from 1) and/or names to parse,
+                            all columns if None. Other columns are parsed on demand.
+            cache:          use the on-disk column cache
+            stream:         parse the file in chunks into a bounded number of rows, by default
+                            only if it is larger than stream_min_size (see RowReducer)
+            where:          list of row conditions like center_h1<1e-4, only the rows matching
+                            all of them are loaded
+
         Returns:
-            True/False
+            MesaTable object
     """
+    return MesaTable(file, columns=columns, cache=cache, stream=stream, where=where)
 
+def _load_worker(file, columns, cache, stream, where, binary=False):
+    """
+        Load a file (a binary run if binary) in a worker process of load_files().
+
+        Returns:
+            None if all the loaded columns ended up in the on-disk cache (the parent then
+            memory-maps them instead of receiving a copy), the MesaTable object otherwise,
+            or the exception raised while loading
+    """
     try:
-        float(num)
-        return True
-    except ValueError:
-        return False
+        table = (BinaryTable if binary else load_data)(file, columns=columns, cache=cache, stream=stream, where=where)
+    except Exception as e:
+        return e
+    if table._cache is not None and all(table._cache.has(index) for index in table._columns):
+        return None
+    return table
+
+def load_files(files, columns=None, jobs=1, cache=True, stream=None, where=None, binary=False):
+    """
+        Load many MESA .data files, in parallel if jobs > 1.
+
+        Parameters:
+            files:          list of paths to the MESA .data files
+            columns:        list of column numbers and/or names to parse, see load_data()
+            jobs:           number of worker processes
+            cache:          use the on-disk column cache
+            stream:         stream the files, see load_data()
+            where:          row conditions, see load_data()
+            binary:         files are binary runs, loaded as BinaryTable objects
+
+        Returns:
+            dictionary file -> MesaTable object, or the exception raised while loading
+            that file. Iterating over the dictionary follows the order of files.
+    """
+    loader = BinaryTable if binary else load_data
+    tables = {}
+    if jobs <= 1 or len(files) < 2:
+        for file in files:
+            try:
+                tables[file] = loader(file, columns=columns, cache=cache, stream=stream, where=where)
+            except Exception as e:
+                tables[file] = e
+        return tables
+
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(files))) as pool:
+        results = pool.map(_load_worker, files, [columns]*len(files), [cache]*len(files), [stream]*len(files), [where]*len(files),
+                           [binary]*len(files))
+        for file, table in zip(files, results):
+            if table is None:
+                # parsed by the worker into the cache, memory-map it here
+                try:
+                    table = loader(file, columns=columns, cache=True, stream=stream, where=where)
+                except Exception as e:
+                    table = e
+            tables[file] = table
+    return tables
+
+### Tracks ###
+##############
+# Every plotted Line2D is registered together with the table and the columns it comes
+# from, so that it can be updated in place (set_data) rather than re-created.
+
+# level of detail: tracks longer than lod_min_points rows are decimated to a few points per
+# pixel column before they reach matplotlib, and re-decimated from the full data on zoom/pan
+lod_min_points = 20000
+
+def decimate(x, y, n_buckets, extra=()):
+    """
+        Min/max-preserving downsampling. The track is split into n_buckets chunks of
+        consecutive rows and in each chunk only the rows holding the minimum and maximum
+        of x and of y are kept, so that narrow features (thermal pulses, blue loops) and the
+        extent of the track survive.
+
+        Parameters:
+            x, y:           numpy arrays of the track
+            n_buckets:      number of chunks, e.g. the width of the axes in pixels
+            extra:          other columns of the track whose extremes are kept as well,
+                            e.g. the colour of a colour-coded track
+
+        Returns:
+            sorted indices of the rows to plot, or None if the track is short enough
+    """
+    n = len(x)
+    n_buckets = max(int(n_buckets), 1)
+    if n <= 4*n_buckets:
+        return None
+
+    size = -(-n // n_buckets)  # rows per chunk, rounded up
+    n_full = n // size * size
+    offsets = np.arange(0, n_full, size)
+    keep = [np.array([0, n-1])]
+    for values in (x, y) + tuple(extra):
+        # NaNs must not be picked as extremes
+        low = np.where(np.isnan(values), np.inf, values)
+        high = np.where(np.isnan(values), -np.inf, values)
+        keep.append(offsets + low[:n_full].reshape(-1, size).argmin(axis=1))
+        keep.append(offsets + high[:n_full].reshape(-1, size).argmax(axis=1))
+        if n_full < n:
+            keep.append([n_full + low[n_full:].argmin(), n_full + high[n_full:].argmax()])
+    return np.unique(np.concatenate(keep))
+
+lod_margin = 0.5 # rows within this fraction of the width of the view beyond its x limits are drawn too
+
+def lod_data(ax, x, y, scale=1., extra=()):
+    """
+        Data of a long track to draw in the axes: the rows within the visible x range (and
+        a margin around it, see lod_margin), decimated to about one chunk per pixel column,
+        so zooming in brings back the full resolution without drawing the rows off screen.
+        The x range is not clipped while the axes autoscale, as the view follows the data.
+
+        Parameters:
+            x, y:           numpy arrays of the track
+            scale:          pixels of the target per screen pixel (dpi of the saved figure / screen dpi)
+            extra:          other columns of the track, returned along with x and y (see decimate())
+
+        Returns:
+            tuple of the x, y and extra values to draw, NaN where the track leaves the drawn
+            range, so that the line is broken there
+    """
+    columns = (x, y) + tuple(extra)
+    rows = None
+    n_buckets = ax.bbox.width * scale
+    if not ax.get_autoscalex_on():
+        x0, x1 = sorted(ax.get_xlim())
+        margin = (x1 - x0) * lod_margin
+        with np.errstate(invalid='ignore'):
+            inside = (x >= x0 - margin) & (x <= x1 + margin)
+        # the rows next to the drawn ones too, so that the line runs up to the edge of the axes
+        inside[1:] |= inside[:-1].copy()
+        inside[:-1] |= inside[1:].copy()
+        if not inside.all():
+            rows = np.flatnonzero(inside)
+            columns = tuple(values[rows] for values in columns)
+            # one chunk per pixel column over the margins as well
+            n_buckets *= 1 + 2*lod_margin
+
+    keep = decimate(columns[0], columns[1], n_buckets, extra=columns[2:])
+    if keep is not None:
+        columns = tuple(values[keep] for values in columns)
+    if rows is None:
+        return columns
+
+    # break the line where rows were left out between two drawn rows
+    drawn = np.arange(len(rows)) if keep is None else keep
+    breaks = np.flatnonzero(np.diff(rows[drawn]) != np.diff(drawn)) + 1
+    return tuple(np.insert(values.astype(float), breaks, np.nan) for values in columns)
+
+class TrackIndex:
+    """
+        Spatial index of a track in display (pixel) coordinates, answering nearest-point
+        queries of the cross hair without a linear scan. Uses a KD-tree if scipy is
+        available and an index sorted on x otherwise.
+    """
+    def __init__(self, points):
+        valid = np.isfinite(points).all(axis=1)
+        self.rows = np.flatnonzero(valid)
+        self.points = points[valid]
+        try:
+            # optional, used by the snapping cross hair to look up the nearest model point
+            from scipy.spatial import cKDTree
+        except ImportError:
+            cKDTree = None
+        if cKDTree is not None:
+            self.tree = cKDTree(self.points)
+        else:
+            self.tree = None
+            self.order = np.argsort(self.points[:, 0], kind='stable')
+            self.sorted_x = self.points[self.order, 0]
+
+    def nearest(self, px, py):
+        """
+            Nearest point of the track to the display position (px, py).
+
+            Returns:
+                row of the point in the track and its distance in pixels, (None, inf) if the track is empty
+        """
+        if len(self.points) == 0:
+            return None, np.inf
+        if self.tree is not None:
+            distance, i = self.tree.query((px, py))
+            return self.rows[i], distance
+
+        # walk outwards from px over the points sorted on x, in blocks, until the remaining
+        # points are further away in x alone than the best candidate so far
+        n = len(self.sorted_x)
+        lo = hi = int(np.searchsorted(self.sorted_x, px))
+        best, best_distance = None, np.inf
+        block = 256
+        while lo > 0 or hi < n:
+            new_lo, new_hi = max(lo - block, 0), min(hi + block, n)
+            candidates = self.order[np.r_[new_lo:lo, hi:new_hi]]
+            distances = np.hypot(self.points[candidates, 0] - px, self.points[candidates, 1] - py)
+            k = distances.argmin()
+            if distances[k] < best_distance:
+                best, best_distance = candidates[k], distances[k]
+            lo, hi = new_lo, new_hi
+            if (lo == 0 or px - self.sorted_x[lo] > best_distance) and (hi == n or self.sorted_x[hi-1] - px > best_distance):
+                break
+        return self.rows[best], best_distance
+
+class Track:
+    """
+        A plotted line and the data behind it.
+    """
+    def __init__(self, line, table, xkey, ykey, xscale=1, yscale=1):
+        self.line = line
+        self.table = table
+        self.xkey = xkey
+        self.ykey = ykey
+        self.xscale = xscale
+        self.yscale = yscale
+        self.decimated = False
+        self._index = None
+        self._index_key = None
+        self._index_columns = None
+
+    def refresh(self, lod=True, scale=1.):
+        """
+            Push the current column values of the table to the line, decimated to the
+            resolution of the axes if the track is long.
+
+            Parameters:
+                lod:        decimate the track if it is longer than lod_min_points rows
+                scale:      pixels of the target per screen pixel, see lod_data()
+        """
+        x = self.table.column(self.xkey)*self.xscale
+        y = self.table.column(self.ykey)*self.yscale
+        self.decimated = lod and len(x) > lod_min_points
+        if self.decimated:
+            x, y = lod_data(self.line.axes, x, y, scale)
+        self.line.set_data(x, y)
+
+    def data(self):
+        """
+            Full-resolution x and y values of the track.
+        """
+        return self.table.column(self.xkey)*self.xscale, self.table.column(self.ykey)*self.yscale
+
+    def point(self, row):
+        """
+            x and y values of the track at a row, without copying the columns.
+        """
+        return self.table.column(self.xkey)[row]*self.xscale, self.table.column(self.ykey)[row]*self.yscale
+
+    def keys(self):
+        """
+            Columns shown by the track.
+        """
+        return (self.xkey, self.ykey)
+
+    def extend_datalim(self):
+        """
+            Extend the data limits of the axes to the track. Lines are taken into account by
+            ax.relim() already.
+        """
+        pass
+
+    def nearest(self, px, py):
+        """
+            Nearest model point of the track to the display position (px, py). The spatial
+            index is built on first use and again only after a zoom/pan or new rows.
+
+            Returns:
+                row of the point and its distance in pixels
+        """
+        ax = self.line.axes
+        columns = (self.table.column(self.xkey), self.table.column(self.ykey))
+        key = (tuple(ax.viewLim.bounds), tuple(ax.bbox.bounds))
+        # new rows (or another table) give new column arrays, checked by identity rather than
+        # copying the columns on every mouse move
+        if self._index_key != key or self._index_columns is None or \
+           any(column is not indexed for column, indexed in zip(columns, self._index_columns)):
+            points = np.column_stack([columns[0]*self.xscale, columns[1]*self.yscale])
+            self._index = TrackIndex(ax.transData.transform(points))
+            self._index_key = key
+            self._index_columns = columns
+        return self._index.nearest(px, py)
+
+class ColorTrack(Track):
+    """
+        A track drawn as a single LineCollection coloured by a third column (uc mode). Each
+        segment takes the colour of the model it starts from.
+    """
+    def __init__(self, collection, table, xkey, ykey, ckey, xscale=1, yscale=1):
+        super().__init__(collection, table, xkey, ykey, xscale=xscale, yscale=yscale)
+        self.ckey = ckey
+
+    def refresh(self, lod=True, scale=1.):
+        x, y = self.data()
+        c = self.table.column(self.ckey)
+        self.decimated = lod and len(x) > lod_min_points
+        if self.decimated:
+            x, y, c = lod_data(self.line.axes, x, y, scale, extra=(c,))
+        points = np.column_stack([x, y])
+        self.line.set_segments(np.stack([points[:-1], points[1:]], axis=1))
+        self.line.set_array(c[:-1])
+
+    def keys(self):
+        return (self.xkey, self.ykey, self.ckey)
+
+    def extend_datalim(self):
+        # relim() leaves the collections out
+        self.line.axes.update_datalim(np.column_stack(self.data()))
+
+def nearest_point(tracks, px, py):
+    """
+        Nearest model point over the tracks to the display position (px, py).
+
+        Returns:
+            track and row of the point, (None, None) if nothing is plotted
+    """
+    best, best_row, best_distance = None, None, np.inf
+    for track in tracks:
+        if not track.line.get_visible():
+            continue
+        row, distance = track.nearest(px, py)
+        if distance < best_distance:
+            best, best_row, best_distance = track, row, distance
+    return best, best_row
+
+def point_readout(track, row):
+    """
+        Text describing a model point: file, model number, age and the plotted columns.
+    """
+    table = track.table
+    text = [table.file_name]
+    names = []
+    for name in ('model_number', 'star_age'):
+        if table.in_data(name):
+            names.append(name)
+    for key in track.keys():
+        if table.name(key) not in names:
+            names.append(table.name(key))
+    for name in names:
+        text.append('{} = {:.6g}'.format(name, table.column(name)[row]))
+    return '\n'.join(text)
 
 # def onclick(event):
 #     if event.button == 'r':
 #         plt.draw() #redraw
 #         plt.show()
 
-def data_names(scr,search_for_history_file=False):
+def column_names(files, common=False):
+    """
+        Column names of many MESA .data files, read from the headers only.
+
+        Parameters:
+            files:          list of paths to the MESA .data files, those that cannot be read are skipped
+            common:         keep only the columns present in every file (intersection) rather than
+                            all of them (union)
+
+        Returns:
+            list of the files read and list of (name, column number, number of files having
+            the column) tuples, in the order of the first file. The column number is None if
+            the column sits at different positions in different files.
+    """
+    read = []
+    positions = {} # name -> column numbers (counting from 1) in the files
+    counts = {}
+    for file in files:
+        try:
+            names = read_header(file)[2]
+        except (OSError, UnicodeDecodeError):
+            continue
+        if not names:
+            continue
+        read.append(file)
+        for i, name in enumerate(names):
+            positions.setdefault(name, set()).add(i+1)
+            counts[name] = counts.get(name, 0) + 1
+
+    columns = []
+    for name, numbers in positions.items():
+        if common and counts[name] < len(read):
+            continue
+        columns.append((name, min(numbers) if len(numbers) == 1 else None, counts[name]))
+    return read, columns
+
+def name_lines(files, columns):
+    """
+        Lines of the column listing of -n, as returned by column_names().
+    """
+    lines = []
+    for name, number, count in columns:
+        line = '{:3d} {}'.format(number, name) if number is not None else '  - {}'.format(name)
+        if count < len(files):
+            line += '  ({}/{} files)'.format(count, len(files))
+        lines.append(line)
+    return lines
+
+def data_names(scr, source, lines):
     """
         Routine that creates curses-based screen and prints the avaiable column names
 
         Parameters:
-            current_ax:     matplotlib axes object
-            other_ax:       matplotlib axes object
+            scr:            curses screen, as passed by curses.wrapper()
+            source:         files the names come from, shown in the title line
+            lines:          list of the lines to print, see name_lines()
     """
-    if search_for_history_file: search_for_hist(files)
+    import curses
+
     # Create curses screen
     scr.keypad(True)
     curses.use_default_colors()
@@ -208,12 +1259,12 @@ def data_names(scr,search_for_history_file=False):
 
     # Fill the window with text (note that 5 lines are lost forever)
     try:
-        scr.addstr(0,0,'Availlable data column names in {} file '.format(file), curses.A_BOLD)
+        scr.addstr(0,0,'Availlable data column names in {} '.format(source), curses.A_BOLD)
         scr.addstr(height-1,0, 'Press q to exit ', curses.A_REVERSE)
 
-        for i in range(0, len(p.bulk_names)):
+        for i in range(0, len(lines)):
             # mypad.addstr(i,0,"{0} This is a sample string...\n".format(i))
-            mypad.addstr(i,0,'{:3d} {}'.format(i+1, p.bulk_names[i]))
+            mypad.addstr(i,0,lines[i])
 
             if i > height: mypad_pos = min(i - height+3, mypad_height - height+3)
             mypad_refresh()
@@ -269,7 +1320,7 @@ def make_format(current_ax, other_ax):
                 .format(*['({:.3f}, {:.3f})'.format(x, y) for x,y in coords]))
     return format_coord
 
-def set_ticks(ax=ax1, labelsize=labelsize):
+def set_ticks(ax, labelsize=labelsize, twin_of=None):
     """
         Set ticks properties.
 
@@ -278,10 +1329,13 @@ def set_ticks(ax=ax1, labelsize=labelsize):
                             specify which axes to characterize
             labelsize:      integer
                             set the tick font size
+            twin_of:        matplotlib axes object
+                            the primary axes if ax is its twin y axis
     """
+    from matplotlib.ticker import AutoMinorLocator
 
     try:
-        if ax == ax1: 
+        if twin_of is None: 
             ax.tick_params(which='minor', direction='in', bottom=True, top=True, left=True, right=True, length=2, width=1, labelsize=labelsize)
             ax.tick_params(direction='in', bottom=True, top=True, left=True, right=True, length=4, width=1, labelsize=labelsize)
             ax.xaxis.set_minor_locator(AutoMinorLocator())
@@ -293,10 +1347,10 @@ def set_ticks(ax=ax1, labelsize=labelsize):
     except: pass
     try:
         # if ax1.twinx().axison: # check if axis is initialised 
-        if ax == ax2: 
+        if twin_of is not None: 
             ax.tick_params(direction='in', bottom=False, top=False, left=False, right=True, length=4, width=1, labelsize=labelsize)
             ax.tick_params(which='minor', direction='in', bottom=False, top=False, left=False, right=True, length=2, width=1, labelsize=labelsize)
-            ax.format_coord = make_format(ax2, ax1) # display cursor value with two axes
+            ax.format_coord = make_format(ax, twin_of) # display cursor value with two axes
             ax.yaxis.set_minor_locator(AutoMinorLocator())
             # in case of using scientific notation fix the tick label size (e.g., 1e10)
             ax.yaxis.get_offset_text().set_fontsize(labelsize)
@@ -378,37 +1432,82 @@ def set_ticks(ax=ax1, labelsize=labelsize):
     # columns_assigned = True # overwrite control to avoid multiple column assigning
     # arg_nr = i-1 # start ploting from argument 3 to avoid errors when the second arg is cols number
 
-def adjust_ylim(ax=ax1, lower_lim=-16):
+def adjust_ylim(ax, lower_lim=-16):
     if ax.get_ylim()[0] < -50:
         ax.set_ylim(lower_lim)
 
+def merge_ylim(ax1, ax2):
+    """
+        Put the primary and the twin y axes on a common range if their limits are
+        within a factor of 2 of each other.
+    """
+    try:
+        if (2. > ax1.get_ylim()[0] / ax2.get_ylim()[0] > 0.5 or 2. > ax2.get_ylim()[0] / ax1.get_ylim()[0] > 0.5 and \
+            2. > ax1.get_ylim()[1] / ax2.get_ylim()[1] > 0.5 or 2. > ax2.get_ylim()[1] / ax1.get_ylim()[1] > 0.5 ):
+            min_lim_bound = min(ax1.get_ylim()[0], ax2.get_ylim()[0])
+            max_lim_bound = max(ax1.get_ylim()[1], ax2.get_ylim()[1])
+            ax1.set_ylim(min_lim_bound, max_lim_bound)
+            ax2.set_ylim(min_lim_bound, max_lim_bound)
+    except ZeroDivisionError:
+        pass
 
-def save_plot(filename):
+def snap_cross_hair(ax, text, event, tracks):
     """
-        Save plot
+        Snap the cross hair to the model point nearest to the mouse, over all plotted files,
+        and show the values of that row.
 
         Parameters:
-            filename:       save file under filename.extension
-                            if no extension provided, default to '.png'
+            ax:             matplotlib axes object of the cross hair
+            text:           text artist of the readout
+            event:          mouse event
+            tracks:         list of the plotted Track objects
+
+        Returns:
+            x, y position of the cross hair in the data coordinates of ax
     """
-    plt.savefig(str(filename), dpi=300)
+    track, row = nearest_point(tracks, event.x, event.y)
+    if track is None:
+        text.set_text('')
+        return ax.transData.inverted().transform((event.x, event.y))
+    text.set_text(point_readout(track, row))
+    # the point may belong to the twin axis, go through the display coordinates
+    display = track.line.axes.transData.transform(track.point(row))
+    return ax.transData.inverted().transform(display)
 
 class BlittedCursor:
     """
-        A cross-hair cursor using blitting for faster redraw
+        A cross-hair cursor using blitting for faster redraw: only the cross hair is
+        redrawn on mouse move, on top of a saved copy of the figure, so its cost does not
+        depend on the number of plotted tracks.
+
+        The cross hair snaps to the nearest model point of the plotted tracks (see
+        snap_cross_hair()), found from the pixel coordinates of the mouse event, so the
+        cursor works the same for column numbers and names and on the twin axis.
     """
-    def __init__(self, ax):
+    def __init__(self, ax, tracks):
         self.ax = ax
+        self.tracks = tracks
+        self.canvas = ax.figure.canvas
         self.background = None
-        self.horizontal_line = ax.axhline(p[abs(int(ycol))-1][0], color='k', alpha=0.5, lw=0.5, ls='--')
-        self.vertical_line =   ax.axvline(p[abs(int(xcol))-1][0], color='k', alpha=0.5, lw=0.5, ls='--')
+        x = np.mean(ax.get_xlim())
+        y = np.mean(ax.get_ylim())
+        # animated artists are left out of the regular draw and only drawn by blitting
+        self.horizontal_line = ax.axhline(y, color='k', alpha=0.5, lw=0.5, ls='--', animated=True)
+        self.vertical_line =   ax.axvline(x, color='k', alpha=0.5, lw=0.5, ls='--', animated=True)
         # text location in axes coordinates
-        self.text = ax.text(0.72, 0.9, '', transform=ax.transAxes)
-        self._creating_background = False
-        ax.figure.canvas.mpl_connect('draw_event', self.on_draw)
+        self.text = ax.text(0.72, 0.97, '', transform=ax.transAxes, va='top', fontsize=legend_fontsize, animated=True)
+        self.set_cross_hair_visible(False)
+        self._cids = [self.canvas.mpl_connect('draw_event', self.on_draw),
+                      self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)]
+
+    def disconnect(self):
+        for cid in self._cids:
+            self.canvas.mpl_disconnect(cid)
 
     def on_draw(self, event):
-        self.create_new_background()
+        # the figure has just been drawn without the cross hair, keep it as the background
+        self.background = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+        self.blit()
 
     def set_cross_hair_visible(self, visible):
         need_redraw = self.horizontal_line.get_visible() != visible
@@ -417,55 +1516,51 @@ class BlittedCursor:
         self.text.set_visible(visible)
         return need_redraw
 
-    def create_new_background(self):
-        if self._creating_background:
-            # discard calls triggered from within this function
+    def blit(self):
+        if self.background is None:
             return
-        self._creating_background = True
-        self.set_cross_hair_visible(False)
-        self.ax.figure.canvas.draw()
-        self.background = self.ax.figure.canvas.copy_from_bbox(self.ax.bbox)
-        self.set_cross_hair_visible(True)
-        self._creating_background = False
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.horizontal_line)
+        self.ax.draw_artist(self.vertical_line)
+        self.ax.draw_artist(self.text)
+        self.canvas.blit(self.ax.figure.bbox)
 
     def on_mouse_move(self, event):
         if self.background is None:
-            self.create_new_background()
+            return
         if not event.inaxes:
-            need_redraw = self.set_cross_hair_visible(False)
-            if need_redraw:
-                self.ax.figure.canvas.restore_region(self.background)
-                self.ax.figure.canvas.blit(self.ax.bbox)
+            if self.set_cross_hair_visible(False):
+                self.blit()
         else:
             self.set_cross_hair_visible(True)
+            x, y = snap_cross_hair(self.ax, self.text, event, self.tracks)
             # update the line positions
-            x, y = event.xdata, event.ydata
             self.horizontal_line.set_ydata([y])
             self.vertical_line.set_xdata([x])
-            # self.text.set_text(f'x={x:1.2f}, y={y:1.2f}')
-
-            self.ax.figure.canvas.restore_region(self.background)
-            self.ax.draw_artist(self.horizontal_line)
-            self.ax.draw_artist(self.vertical_line)
-            self.ax.draw_artist(self.text)
-            self.ax.figure.canvas.blit(self.ax.bbox)
+            self.blit()
 
 class Cursor:
     """
-        A cross hair cursor.
+        A cross hair cursor redrawing the whole figure, for backends that cannot blit.
     """
-    def __init__(self, ax, type):
+    def __init__(self, ax, tracks):
         self.ax = ax
-        if type == 'int':
-            self.horizontal_line = ax.axhline(p[abs(int(ycol))-1][0], color='k', lw=0.5, alpha=0.5, ls='--')
-            self.vertical_line =   ax.axvline(p[abs(int(xcol))-1][0], color='k', lw=0.5, alpha=0.5, ls='--')
-        if type == 'str':
-            self.horizontal_line = ax.axhline(getattr(p, xcol)[0], color='k', lw=0.5, alpha=0.5, ls='--')
-            self.vertical_line =   ax.axvline(getattr(p, ycol)[0], color='k', lw=0.5, alpha=0.5, ls='--')
+        self.tracks = tracks
+        self.canvas = ax.figure.canvas
+        x = np.mean(ax.get_xlim())
+        y = np.mean(ax.get_ylim())
+        self.horizontal_line = ax.axhline(y, color='k', lw=0.5, alpha=0.5, ls='--')
+        self.vertical_line =   ax.axvline(x, color='k', lw=0.5, alpha=0.5, ls='--')
 
         # text location in axes coordinates
-        self.text = ax.text(0.72, 0.9, '', transform=ax.transAxes)
-# p[abs(int(xcol))-1][0], p[abs(int(ycol))-1][0]
+        self.text = ax.text(0.72, 0.97, '', transform=ax.transAxes, va='top', fontsize=legend_fontsize)
+        self.set_cross_hair_visible(False)
+        self._cids = [self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)]
+
+    def disconnect(self):
+        for cid in self._cids:
+            self.canvas.mpl_disconnect(cid)
+
     def set_cross_hair_visible(self, visible):
         need_redraw = self.horizontal_line.get_visible() != visible
         self.horizontal_line.set_visible(visible)
@@ -477,829 +1572,1974 @@ class Cursor:
         if not event.inaxes:
             need_redraw = self.set_cross_hair_visible(False)
             if need_redraw:
-                self.ax.figure.canvas.draw()
+                self.canvas.draw_idle()
         else:
             self.set_cross_hair_visible(True)
-            x, y = event.xdata, event.ydata
+            x, y = snap_cross_hair(self.ax, self.text, event, self.tracks)
             # update the line positions
             self.horizontal_line.set_ydata([y])
             self.vertical_line.set_xdata([x])
-            # self.text.set_text(f'x={x:1.2f}, y={y:1.2f}')
-            self.ax.figure.canvas.draw()
-
-def search_for_hist(files):
-    # numer_of_files = 0
-    for i in range(len(files)):
-        if os.path.isfile(files[i] + '/LOGS/history.data'):
-            file_list.append(files[i] + '/LOGS/history.data')
-            # numer_of_files = numer_of_files + 1
-        if os.path.isfile(files[i] + '/LOGS1/history.data'):
-            file_list.append(files[i] + '/LOGS1/history.data')
-            # numer_of_files = numer_of_files + 1
-        if os.path.isfile(files[i] + '/LOGS2/history.data'):
-            file_list.append(files[i] + '/LOGS2/history.data')
-            # numer_of_files = numer_of_files + 1
-        if os.path.isfile(files[i] + '/history.data'):
-            file_list.append(files[i] + '/history.data')
-            # numer_of_files = numer_of_files + 1
-
-
-
-### Modular wrapper inserted by refactor ###
-# The code block below has been wrapped into a function `plot_all()` so it can be re-used
-# for initial draw and for on-demand refresh with the 'a' key.
-def plot_all():
-    global fig, ax1, ax2, include_legend, if_crosshair_cursor
-    global multiplicator, lw, ls, alpha, ms, marker, file, numer_of_files
-    global xcol, ycol, p
-
-    ax2 = None
-
-    # jeśli osie już istnieją, czyścimy je
-    if ax1 is not None:
-        ax1.cla()
-        # remove axis-level legend on ax1 if present
-        try:
-            leg = ax1.get_legend()
-            if leg is not None:
-                leg.remove()
-        except Exception:
-            pass
-    if ax2 is not None:
-        ax2.cla()
-        # remove axis-level legend on ax2 if present
+            self.canvas.draw_idle()
+
+### File discovery ###
+######################
+# -r walks the passed directories down to any depth and picks up the files whose path ends
+# with one of the patterns (shell-style, matched component by component), e.g. LOGS*/history.data
+# matches M1.0/LOGS/history.data as well as grid/Z0.014/M1.0/LOGS_rot/history.data.
+#
+# The directories seen are kept in an index in cache_dir/index/, together with their mtime,
+# matched files and subdirectories. A directory's mtime changes only when entries are added
+# to or removed from it, so the next -r on the same tree only stats the directories and
+# lists again those that changed.
+
+history_patterns = ['LOGS*/history.data', 'history.data']
+profile_patterns = ['LOGS*/profile*.data']
+scan_threads = 16 # directories are listed by a pool of threads, os.scandir releases the GIL
+
+def match_path(parts, patterns):
+    """
+        Check whether a path matches any of the patterns.
+
+        Parameters:
+            parts:          tuple of the path components
+            patterns:       list of the patterns, e.g. LOGS*/history.data
+    """
+    import fnmatch
+    for pattern in patterns:
+        pattern_parts = pattern.strip('/').split('/')
+        if len(parts) >= len(pattern_parts) and \
+           all(fnmatch.fnmatch(part, pattern_part) for part, pattern_part in zip(parts[-len(pattern_parts):], pattern_parts)):
+            return True
+    return False
+
+def _dir_mtimes(paths):
+    mtimes = []
+    for path in paths:
         try:
-            if hasattr(ax2, 'get_legend'):
-                leg2 = ax2.get_legend()
-                if leg2 is not None:
-                    leg2.remove()
-        except Exception:
-            pass
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
 
-    # remove any figure-level legends to avoid duplicates
+def _scan_dir(root, rel, patterns):
+    """
+        List a directory of the tree under root.
+
+        Returns:
+            index entry of the directory (mtime, matched files and subdirectories), None if it cannot be read
+    """
+    path = os.path.join(root, rel) if rel else root
     try:
-        if hasattr(fig, 'legends') and fig.legends:
-            for _l in list(fig.legends):
+        mtime = os.stat(path).st_mtime_ns
+        parts = tuple(rel.split('/')) if rel else ()
+        files, dirs = [], []
+        with os.scandir(path) as entries:
+            for item in entries:
+                if item.name.startswith('.'):
+                    continue
                 try:
-                    _l.remove()
-                except Exception:
+                    # symbolic links to directories are not followed, they may loop
+                    if item.is_dir(follow_symlinks=False):
+                        dirs.append(item.name)
+                    elif match_path(parts + (item.name,), patterns):
+                        files.append(item.name)
+                except OSError:
                     pass
-    except Exception:
-        pass
+    except OSError:
+        return None
+    return {'mtime': mtime, 'files': sorted(files), 'dirs': sorted(dirs)}
 
+def discover(root, patterns, reindex=False):
+    """
+        Files under the directory root matching the patterns, using and updating its index.
 
-    set_ticks(ax=ax1)
+        Parameters:
+            root:           directory to walk
+            patterns:       list of the patterns, e.g. LOGS*/history.data
+            reindex:        ignore the index and list every directory again
 
-    ### Specify columns to plot ###
-    ###############################
-    
-    # file = str(sys.argv[1])
-    # set_ticks(ax=ax1)
-    
-    search_for_history_file = False
-    found_history_file = False
-    search_for_columns = False
-    columns_assigned = False
-    multiple_cols_same_axis = False
-    use_size_map = False
-    use_color_map = False
-    if_save_plot = False
-    if_crosshair_cursor = False
-    equal_ylim = False
-    
-    ls = 'solid'
-    lw = 4
-    marker = None
-    ms = 0
-    alpha = 0.8
-    
-    files = sys.argv
-    
-    for i, arg in enumerate(sys.argv):
-    
-        if (str(arg) == '-r'):
-            search_for_history_file = True
-            search_for_hist(file_list)
-    
-        if (str(arg) == '-ylim'):
-            equal_ylim = True
-    
-        if (str(arg) == '-l'):
-            include_legend = True
-    
-        if (str(arg) == '-/l'):
-            include_legend = False        
-    
-        if (str(arg) == '-c'):
-            if_crosshair_cursor = True
-    
-        if (str(arg) == '-wl'):
-            # print('Detected -wl')
-            ls = 'solid'
-            lw = 4
-            ms = 0
-            marker = None
-            alpha = 0.8
-    
-        if (str(arg) == '-wp'):
-            # print('Detected -wp')
-            ls = None
-            lw = 0
-            ms = 5
-            marker = '.'
-            alpha = 1.
-    
-        if (str(arg) == '-wlp' or str(arg) == '-wpl'):
-            # print('Detected -wlp')
-            ls = 'solid'
-            lw = 2
-            ms = 10
-            marker = '.'
-            alpha = 0.7
-    
-        # if (str(arg) == '-n'):
-        #     search_for_columns = True
-            
-        #     # p = mesa.MesaData(str(file))
-        #     # if search_for_history_file:
-        #     #     curses.wrapper(data_names,search_for_history_file=True)
-        #     #     exit()
-        #     # else:
-        #     #     curses.wrapper(data_names)
-        #     #     exit()
-    
-        #     executed = False
-        #     for i in range(len(files)):
-        #         if executed == False:
-        #             try:
-        #                 p = mesa.MesaData(str(files[i]))
-        #                 if search_for_history_file:
-        #                     curses.wrapper(data_names,search_for_history_file=True)
-        #                     exit()
-        #                 else:
-        #                     curses.wrapper(data_names)
-        #                     exit()
-        #                 executed = True
-        #             except:
-        #                 pass
-        #     exit()
-        if (str(arg) == '-n'):
-            search_for_columns = True
-            executed = False  # Flag to check if column analysis has been executed
-            
-            for file in file_list:  # Iterate over all files from the arguments
-                if executed is False:  # Ensure we process only one file
-                    try:
-                        p = mesa.MesaData(file)  # Attempt to load the file
-                        if search_for_history_file:
-                            curses.wrapper(data_names, search_for_history_file=True)
-                        else:
-                            curses.wrapper(data_names)
-                        executed = True  # Stop further processing after first file
-                    except:
-                        continue
-            if not executed:
-                print("No valid files found to display column names.")
-            exit()
-    
-    
-        if (str(arg[0:6]) == '-save='):
-            cols = str(sys.argv[i])
-            split_save = str.rsplit(cols, sep="=") # split arg like '1:2' for two numbers
-            save_file_name = split_save[1]
-            if_save_plot = True
-            
-    
-        # specify which cols to plot
-        if columns_assigned == False:
-            if (str(arg) == 'u' or str(arg) == 'uc' or str(arg) == 'us' or str(arg) == 'mu'):
-                columns_assigned = True # overwrite control to avoid multiple column assigning
-    
-                # determine if to use size/color maps. Requires at least 3 columns to plot
-                if (str(arg) == 'uc'): 
-                    use_color_map = True
-                if (str(arg) == 'us'): 
-                    use_size_map = True
-    
-    
-                # if columns ARE provided
-                cols = str(sys.argv[i+1])
-                split_cols = str.rsplit(cols, sep=":") # split arg like '1:2' for two numbers
-    
-                if len(split_cols) == 2:
-                    # if numbers of columns are provided
-                    if (try_float(split_cols[0]) is True):
-                        xcol = int(split_cols[0])
-                        ycol = int(split_cols[1])
-                        type = 'int'
-    
-                        if xcol < 0: plt.gca().invert_xaxis()
-                        if ycol < 0: plt.gca().invert_yaxis()
-    
-                    # if column names rather than column numbers are provided
-                    if (try_float(split_cols[0]) is False):
-                        xcol = split_cols[0]
-                        ycol = split_cols[1]
-                        type = 'str'
-    
-                    use_columns = 2
-    
-                if len(split_cols) == 3:
-                    # if numbers of columns are provided
-                    if (try_float(split_cols[0]) is True):
-                        xcol = int(split_cols[0])
-                        ycol = int(split_cols[1])
-                        zcol = int(split_cols[2])
-                        type = 'int'
-    
-                        if xcol < 0: plt.gca().invert_xaxis()
-                        if ycol < 0: plt.gca().invert_yaxis()
-                        if zcol < 0: plt.gca().invert_yaxis()
-    
-                    # if column names rather than column numbers are provided
-                    if (try_float(split_cols[0]) is False):
-                        xcol = split_cols[0]
-                        ycol = split_cols[1]
-                        zcol = split_cols[2]
-                        type = 'str'
-    
-                    use_columns = 3
-    
-                if len(split_cols) == 4:
-                    # if numbers of columns are provided
-                    if (try_float(split_cols[0]) is True):
-                        xcol = int(split_cols[0])
-                        ycol = int(split_cols[1])
-                        zcol = int(split_cols[2])
-                        ccol = int(split_cols[3])
-                        type = 'int'
-    
-                        if xcol < 0: plt.gca().invert_xaxis()
-                        if ycol < 0: plt.gca().invert_yaxis()
-                        if zcol < 0: plt.gca().invert_yaxis()
-    
-                    # if column names rather than column numbers are provided
-                    if (try_float(split_cols[0]) is False):
-                        xcol = split_cols[0]
-                        ycol = split_cols[1]
-                        zcol = split_cols[2]
-                        ccol = split_cols[3]
-                        type = 'str'
-    
-                    use_columns = 4
-    
-                # columns_assigned = True # overwrite control to avoid multiple column assigning
-                arg_nr = i-1 # start ploting from argument 3 to avoid errors when the second arg is cols number
-    
-            # else:
-            #     # if columns ARE NOT provided
-            #     arg_nr = 1 # start ploting from argument 1
-            #     xcol = 1   # 1, not 0 to avoid errors with the python counting, which starts from 0
-            #     ycol = 2   # -||-
-            #     type = 'int'
-    
-            #     use_columns = 2
-    
-    
-            # if (str(arg) == 'uc' or str(sys.argv[i]) == 'us'):
-    
-    
-            # allow for multiple columns to be plotted, e.g. 1:2 3:4...
-            if (str(arg) == 'mu'):
-    
-                xcol = []
-                ycol = []
-    
-                mu_number = 0
-    
-                for z in range(i, len(sys.argv)):
-                    try:
-                        cols = str(sys.argv[z+1])
-                        split_cols = str.rsplit(cols, sep=":") # split arg like '1:2' for two numbers
-    
-                        xcol.append(int(split_cols[0]))
-                        ycol.append(int(split_cols[1]))
-                        type = 'int'
-    
-                        # print(xcol,ycol)
-                        use_columns = 2
-                        # print(use_columns)
-                        mu_number += 1
-                        multiple_cols_same_axis = True
-                    except:
-                        pass
-                # print(use_columns,mu_number,xcol,ycol)
-                # while True:
-                #     # if columns ARE provided
-                #     try:
-                #         cols = str(sys.argv[i+1])
-                #     except:
-                #         pass
-                #     # if cols=="": break
-    
-                #     split_cols = str.rsplit(cols, sep=":") # split arg like '1:2' for two numbers
-                #     mu_number =+ 1
-    
-                #     xcol.append(int(split_cols[0]))
-                #     ycol.append(int(split_cols[1]))
-    
-                #     print(xcol,ycol)
-                #     i = i+1
-    
-                #     # if len(split_cols) == 2:
-                #     #     # if numbers of columns are provided
-                #     #     if (try_float(split_cols[0]) is True):
-                #     #         xcol = int(split_cols[0])
-                #     #         append.xcol(int(split_cols[0]))
-                #     #         ycol = int(split_cols[1])
-                #     #         type = 'int'
-    
-                #     #         if xcol < 0: plt.gca().invert_xaxis()
-                #     #         if ycol < 0: plt.gca().invert_yaxis()
-    
-                #     #     # if column names rather than column numbers are provided
-                #     #     if (try_float(split_cols[0]) is False):
-                #     #         xcol = split_cols[0]
-                #     #         ycol = split_cols[1]
-                #     #         type = 'str'
-    
-                # columns_assigned = True # overwrite control to avoid multiple column assigning
-                arg_nr = i-1 # start ploting from argument 3 to avoid errors when the second arg is cols number
-    
-    
-    
-    # colors = plt.cm.jet(np.linspace(0,1,len(sys.argv)-arg_nr))
-    # colors = plt.cm.tab20c(np.linspace(0,1,len(sys.argv)-arg_nr))
-    # colors = plt.cm.tab20c(np.linspace(0,1))
-    # cmap = plt.get_cmap("tab10")
-    
-    n=-1
-    
-    if_inverted_axis = False
-    is_twin_y = False
-    is_colorbar_defined = False
-    is_twin_axis_legend_enabled = False
-    if_age = False
-    
-    legend_handles=[]
-    
-    value_min = None
-    value_max = None
-    
-    # loop for possibly many files to plot
-    legend_handles = []
-    legend_labels = []
-    
-    # if '-r' is included in the terminal input, then look for history.data files recursively
-    # files = sys.argv
-    numer_of_files = 0
-    # if search_for_history_file == True: search_for_hist(file_list)
-    for i in range(1, len(file_list)):  # Zaczynamy od 1, aby pominąć ścieżkę do skryptu
-        if os.path.isfile(file_list[i]):  # Sprawdzamy, czy to plik
-            file_to_plot = file_list[i]
-            numer_of_files += 1
-    
-    
-    for file in file_list:
+        Returns:
+            sorted list of the paths found
+    """
+    import concurrent.futures
+    root = os.path.abspath(root)
+    key = hashlib.sha1(json.dumps([root, sorted(patterns)]).encode()).hexdigest()[:20]
+    index_file = os.path.join(cache_dir, 'index', key + '.json')
+
+    old = {}
+    if not reindex:
         try:
-            n=n+1
-            if (type == 'int'):
-                p = np.loadtxt(file,unpack=True, skiprows=7)
-                
-                if use_columns == 2:
-                    
-                    # handle axes labels
-                    m = mesa.MesaData(str(file))
-    
-                    if multiple_cols_same_axis == True:
-                        str_y = ''
-                        for z in range(0,mu_number): str_y += str(m.bulk_names[abs(int(ycol[z]))-1]) +', '
-    
-                        ax1.set_xlabel(label_prefix+m.bulk_names[abs(int(xcol[0]))-1],fontsize=fontsize,labelpad=4)
-                        ax1.set_ylabel(label_prefix+str_y[:-2],fontsize=fontsize,labelpad=4)
-                    else:
-                        ax1.set_xlabel(label_prefix+m.bulk_names[abs(int(xcol))-1],fontsize=fontsize,labelpad=4)
-                        ax1.set_ylabel(label_prefix+m.bulk_names[abs(int(ycol))-1],fontsize=fontsize,labelpad=4)
-    
-                    # print('TRY')
-                    try:
-                        # print(i)
-                        if multiple_cols_same_axis == True:
-                            for z in range(mu_number):
-                                label = file+' '+str(m.bulk_names[abs(int(ycol[z]))-1])
-    
-                                ax1.plot(p[abs(int(xcol[z]))-1],p[abs(int(ycol[z]))-1]*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=label)
-                                # ax1.plot(p[abs(int(xcol[z]))-1],p[abs(int(ycol[z]))-1]*multiplicator, linewidth=0.5, alpha=0.5, c='grey', label=label)
-                        else:
-                            ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1]*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-                            # ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1]*multiplicator, linewidth=0.5, alpha=0.5, c='grey', label=file)
-                            
-                            # if file[0:9] == '../single' and 0.0 < float(file[-8:-5]) < 0.4 :
-                            #     ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1]*multiplicator, c='tab:blue', linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file, zorder=1)
-    
-                            # if file[0:6] == 'binary' and 0.0 < float(file[-8:-5]) < 0. :
-                            #     ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1]*multiplicator, c='tab:orange', linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file, zorder=10)
-                    except:
-                        print('\nError loading ' + file + ' file ')
-    
-                if use_columns == 3 or use_columns == 4: 
-                    
-                    # handle axes labels
-                    m = mesa.MesaData(str(file))
-                    ax1.set_xlabel(label_prefix+m.bulk_names[abs(int(xcol))-1],fontsize=fontsize,labelpad=4)
-                    ax1.set_ylabel(label_prefix+m.bulk_names[abs(int(ycol))-1],fontsize=fontsize,labelpad=4)
-    
-    
-                    if use_size_map == False and use_color_map == False:
-                        if is_twin_y == False: 
-                            ax2 = ax1.twinx()
-                            set_ticks(ax=ax2)
-                            ax2.cla()
-                            is_twin_y = True
-    
-                        ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1], linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-                        ax2.plot(p[abs(int(xcol))-1],p[abs(int(zcol))-1], linewidth=2.0, linestyle='dashed', alpha=alpha, marker=',', ms=ms, label=file, zorder=0.5)
-                    
-                        ax2.set_ylabel(label_prefix+m.bulk_names[abs(int(zcol))-1],fontsize=fontsize,labelpad=4)
-    
-                    elif use_size_map == True:
-                        plt.tick_params(labelright=False) 
-                        if is_twin_y == False: 
-                            ax2 = ax1.twinx()
-                            set_ticks(ax=ax2)
-                            is_twin_y = True
-    
-                        ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1], linewidth=0.5, alpha=alpha, label=file)
-                        value = p[abs(int(zcol))-1]
-    
-                        # Assign min and max values for the firts entry
-                        if value_min is None and value_max is None:
-                            value_min = value.min()
-                            value_max = value.max()
-                        # update min and max values using following entries    
-                        elif value_min is not None and value_max is not None:
-                            if value.min() < value_min:
-                                value_min = value.min()
-                            if value.max() > value_max:
-                                value_max = value.max()
-                        print('%.5f' % value_min, '%.5f' %value_max)
-    
-                        # normalise values between 0 and 1 and shift to cover range 1 - 30
-                        value_norm = (value - value_min)/(value_max - value_min) * 49 + 1 # value.ptp() is equivalent to max - min
-                        marker_size = (value_norm).tolist() # s has to be in a list type
-                        
-    
-                        title = label_prefix+m.bulk_names[abs(int(zcol))-1]
-                        handles, labels = ax2.scatter(p[abs(int(xcol))-1],p[abs(int(ycol))-1], alpha=alpha, s=marker_size).legend_elements(prop="sizes", alpha=0.6, num=10)
-                        # print(handles, labels)
-    
-                        # label_min = str(p[abs(int(zcol))-1].min())
-                        # label_max = str(p[abs(int(zcol))-1].max())
-                        label_min = p[abs(int(zcol))-1].min()
-                        label_max = p[abs(int(zcol))-1].max()
-    
-                        labels = ['$\\mathdefault{{%6.3f}}$' % label_min, '$\\mathdefault{}$', '$\\mathdefault{}$', '$\\mathdefault{}$', '$\\mathdefault{}$', '$\\mathdefault{}$', '$\\mathdefault{}$', '$\\mathdefault{}$', '$\\mathdefault{ }$', '$\\mathdefault{{%6.3f}}$' % label_max]
-                        # legend_handles.append(handles)
-                        # legend_labels.append(labels)
-                        ax2.legend(handles, labels, loc="center", title=title, fontsize=sizemap_label_fontsize, title_fontsize=title_fontsize, ncol=len(labels), frameon=False, 
-                                       bbox_to_anchor=(0.5, 1.06),markerscale=markerscale)
-    
-                        # print(i)
-    
-    
-                        # if is_twin_axis_legend_enabled == False: 
-                        #     # labels = [labels[0],labels[9]]
-                        #     ax2.legend(handles, labels, loc="center", title=title, fontsize=sizemap_label_fontsize, title_fontsize=title_fontsize, ncol=len(labels), frameon=False, 
-                        #                bbox_to_anchor=(0.5, 1.06))
-                        #     is_twin_axis_legend_enabled = True
-    
-                        # sizes = ax2.scatter(p[abs(int(xcol))-1],p[abs(int(ycol))-1], alpha=0.7, s=marker_size).legend_elements(prop="sizes", alpha=0.6)
-    
-                        # kw = dict(prop="sizes", num=5, color=scatter.cmap(0.7), fmt="$ {x:.2f}",
-                        #           func=lambda s: np.sqrt(s/.3)/3)
-                        # legend2 = ax.legend(*sizes.legend_elements(**kw),
-                        #                     loc="lower right", title="Price")
-    
-                        # print('ok')
-                        # ax2.legend(sc.size_map("sizes", num=6))
-                        # print('ok2')
-                        # if is_twin_axis_legend_enabled == False:
-                        #     is_twin_axis_legend_enabled = True
-                        #     label = str(label_prefix+m.bulk_names[abs(int(zcol))-1]+':')
-    
-                        #     size_map_name = ax2.scatter(p[abs(int(xcol))-1][0],p[abs(int(ycol))-1][0], s=1, c='white', label=label)
-                        #     ax2.legend(*sc.size_map("sizes", num=2),fontsize=legend_fontsize)
-    
-                            # size_map_name = ax2.scatter(p[abs(int(xcol))-1][0],p[abs(int(ycol))-1][0], s=1, c='white', label=label)
-                            # where_min = np.where(p[abs(int(xcol))-1] == p[abs(int(xcol))-1].min())
-                            # size_map_min = ax2.scatter(p[abs(int(xcol))-1][where_min],p[abs(int(ycol))-1][where_min], s=1, label='min')
-                            # where_max = np.where(p[abs(int(xcol))-1] == p[abs(int(xcol))-1].max())
-                            # size_map_max = ax2.scatter(p[abs(int(xcol))-1][where_max],p[abs(int(ycol))-1][where_max], s=20, label='max')
-    
-                            # size_map_min = ax2.scatter(p[abs(int(xcol))-1][0],p[abs(int(ycol))-1][0], s=1, label='min')
-                            # size_map_max = ax2.scatter(p[abs(int(xcol))-1][0],p[abs(int(ycol))-1][0], s=20, label='max')
-    
-    
-                            # legend_handles=[size_map_name, size_map_min, size_map_max]
-                            # ax2.legend(ncol=3,handles=legend_handles,fontsize=legend_fontsize)
-                            # ax2.legend(bbox_to_anchor=(1, 1.1),ncol=3,handles=legend_handles,fontsize=legend_fontsize)
-    
-                            
-                            # fig.text(0.5,1,label_prefix,fontsize=fontsize, 
-                            #     horizontalalignment='right', verticalalignment='bottom')
-                            # plt.text(0.5, 0.95, 'textstr', fontsize=14, transform=plt.gcf().transFigure)
-                            
-                            # plt.title(r'Size-map enabled. Using MESA.'+m.bulk_names[abs(int(zcol))-1]+' as 3-rd variable.', fontsize=fontsize)
-                        # leg = plt.legend(handles=legend_handles, loc=1)# loc=(1.03,0), title="Year")
-                        # # ax1.add_artist(leg)
-                        # ax = plt.gca().add_artist(leg)
-    
-    
-    
-                    # for now only works with one file to plot
-                    # elif use_color_map == True:
-    
-                    #     # ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1], wlp, linewidth=3.0, alpha=0.7, ms=ms, label=file)
-                    #     # color = [str(item/255.) for item in p[abs(int(ccol))-1]]
-                    #     # ax1.scatter(p[abs(int(xcol))-1],p[abs(int(zcol))-1], c=color)
-    
-                    #     from matplotlib.collections import LineCollection
-                    #     from matplotlib.cm import ScalarMappable
-    
-                    #     x = p[abs(int(xcol))-1]
-                    #     y = p[abs(int(ycol))-1]
-                    #     color_axis = p[abs(int(zcol))-1]
-    
-                    #     # Create a set of line segments so that we can color them individually
-                    #     # This creates the points as an N x 1 x 2 array so that we can stack points
-                    #     # together easily to get the segments. The segments array for line collection
-                    #     # needs to be (numlines) x (points per line) x 2 (for x and y)
-                    #     points = np.array([x, y]).T.reshape(-1, 1, 2)
-                    #     segments = np.concatenate([points[:-1], points[1:]], axis=1)
-    
-                    #     # Create a continuous norm to map from data points to colors
-                    #     norm = plt.Normalize(color_axis.min(), color_axis.max())
-                    #     lc = LineCollection(segments, cmap='inferno', norm=norm, linewidths=3.0, label=file)
-                    #     # Set the values used for colormapping
-                    #     lc.set_array(color_axis)
-                    #     if is_colorbar_defined == False:
-                    #         is_colorbar_defined = True
-    
-                    #         line = ax1.add_collection(lc)
-                    #         colorbar = fig.colorbar(line, ax=ax1)
-                    #         colorbar.set_label(label_prefix+m.bulk_names[abs(int(zcol))-1],fontsize=fontsize,labelpad=4)
-                    #         colorbar.ax1.tick_params(labelsize=fontsize)
-    
-    
-                    #     # ax1.set_xlim(0.9*x.min(), 1.1*x.max())
-                    #     # if m.bulk_names[abs(int(xcol))-1]=='model_number':
-                    #     #     ax1.set_xlim(0, x.max())
-                    #     # else:
-                    #     #     ax1.set_xlim(0.9*x.min(), 1.1*x.max())
-                    #     # ax1.set_ylim(-1.1, 1.1)
-                    #     # plt.show()
-    
-    
-    
-    
-                    #     # lc = LineCollection(segments_from(p[abs(int(xcol))-1],p[abs(int(ycol))-1]),
-                    #     #                     linewidths=2.0,
-                    #     #                     norm=norm, cmap=cmap)
-                    #     # lc.set_array(p[abs(int(zcol))-1])
-                    #     # ax1.add_collection(lc)
-    
-                    #     # colorbar = fig.colorbar(ScalarMappable(norm=norm, cmap=cmap))
-                    #     # colorbar.set_label(r'$\log\ dM/dt\ \rm{[M_{\odot}\ y^{-1}]}$', fontsize=20)
-                    #     # colorbar.ax1.tick_params(labelsize=15)
-    
-    
-    
-    
-                    # # create other y axis assiming that x-axis is shared between data
-                    # if is_twin_y == False: 
-                    #     ax2 = ax1.twinx()
-                    #     set_ticks(ax=ax2)
-                    #     is_twin_y = True
-    
-                    # # handle axes labels
-                    # m = mesa.MesaData(str(file))
-                    # ax1.set_xlabel(label_prefix+m.bulk_names[abs(int(xcol))-1],fontsize=fontsize,labelpad=4)
-                    # ax1.set_ylabel(label_prefix+m.bulk_names[abs(int(ycol))-1],fontsize=fontsize,labelpad=4)
-                    # ax2.set_ylabel(label_prefix+m.bulk_names[abs(int(zcol))-1],fontsize=fontsize,labelpad=4)
-    
-                    
-                    # try:
-                    #     ax1.plot(p[abs(int(xcol))-1],p[abs(int(ycol))-1], linewidth=lw, linestyle=ls, alpha=0.7, ms=ms, marker=marker, label=file)
-                    #     ax2.plot(p[abs(int(xcol))-1],p[abs(int(zcol))-1], linewidth=2.0, linestyle='dashed', alpha=0.7, marker=',', ms=ms, label=file)
-                    # except:
-                    #     print('\nError loading ' + file + ' file ')
-    
-            if (type == 'str'):
-                if use_columns == 2:
-                    
-                    p = mesa.MesaData(str(file))
-    
-                    try:
-                        xcol = split_cols[0]
-                        ycol = split_cols[1]
-    
-                        if str(split_cols[0]) == 'log_Teff' and if_inverted_axis == False: 
-                            plt.gca().invert_xaxis() 
-                            if_inverted_axis = True         # make sure the xaxis gets inverted only once
-                        # if str(split_cols[0]) == 'star_age' or str(split_cols[0]) == 'age':
-                        #     max_exponent = max([int(f"{x:.1e}".split("e")[1]) for x in getattr(p, xcol)])
-                        #     # print(max_exponent)
-                        #     if_age = True
-    
-                        if if_age:
-                            ax1.plot(getattr(p, xcol)/10**max_exponent, getattr(p, ycol)*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-                        else:
-                            ax1.plot(getattr(p, xcol), getattr(p, ycol)*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-                        # ax1.plot(getattr(p, xcol), getattr(p, ycol), linewidth=lw, linestyle=ls,  alpha=alpha, ms=ms, label=label)
-                        # ax1.plot(p.xcol,p.ycol, c=colors[n], linewidth=lw, linestyle=ls, label=file)
-    
-                        # handle axes labels
-                        if if_age:
-                            ax1.set_xlabel(fr'star_age [$10^{max_exponent}$ yr]',fontsize=fontsize,labelpad=4)
-                        else:
-                            ax1.set_xlabel(label_prefix+xcol,fontsize=fontsize,labelpad=4)
-                        ax1.set_ylabel(label_prefix+ycol,fontsize=fontsize,labelpad=4)
-    
-                    except:
-                        print('\n  strError - column "%s" or "%s" names not found' %(xcol,ycol))#+str(n)+'\n')
-    
-                if use_columns == 3:
-                    
-                    # create other y axis assiming that x-axis is shared between data
-                    if is_twin_y == False: 
-                        ax2 = ax1.twinx()
-                        ax2.cla()
-                        set_ticks(ax=ax2)
-                        is_twin_y = True
-                    # ax2.yaxis.set_minor_locator(AutoMinorLocator())
-                    # ax2.tick_params(direction='in', labelsize=labelsize)
-                    # ax2.format_coord = make_format(ax2, ax1)
-    
-                    p = mesa.MesaData(str(file))
-                    try:
-                        xcol = split_cols[0]
-                        ycol = split_cols[1]
-                        zcol = split_cols[2]
-    
-                        if str(split_cols[0]) == 'log_Teff' and if_inverted_axis == False: 
-                            plt.gca().invert_xaxis() 
-                            if_inverted_axis = True         # make sure the xaxis gets inverted only once
-                        # if str(split_cols[0]) == 'star_age' or str(split_cols[0]) == 'age':
-                        #     max_exponent = max([int(f"{x:.1e}".split("e")[1]) for x in getattr(p, xcol)])
-                        #     # print(max_exponent)
-                        #     if_age = True
-                        
-                        if if_age:
-                            ax1.plot(getattr(p, xcol)/10**max_exponent, getattr(p, ycol)*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-                            ax2.plot(getattr(p, xcol)/10**max_exponent, getattr(p, zcol), linewidth=2.0, linestyle='dashed', alpha=alpha, marker=',', ms=ms, label=file, zorder=0.5)
-                        else:
-                            ax1.plot(getattr(p, xcol), getattr(p, ycol)*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-                            ax2.plot(getattr(p, xcol), getattr(p, zcol), linewidth=2.0, linestyle='dashed', alpha=alpha, marker=',', ms=ms, label=file, zorder=0.5)
-                        # ax1.plot(getattr(p, xcol), getattr(p, ycol)*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-                        # ax2.plot(getattr(p, xcol), getattr(p, zcol), linewidth=2.0, linestyle='dashed', alpha=alpha, marker=',', ms=ms, label=file, zorder=0.5)
-    
-                        # handle axes labels
-                        if if_age:
-                            ax1.set_xlabel(fr'star_age [$10^{max_exponent}$ yr]',fontsize=fontsize,labelpad=4)
-                        else:
-                            ax1.set_xlabel(label_prefix+xcol,fontsize=fontsize,labelpad=4)
-                        ax1.set_ylabel(label_prefix+ycol,fontsize=fontsize,labelpad=4)
-                        ax2.set_ylabel(label_prefix+zcol,fontsize=fontsize,labelpad=4)
-                        
-                    except:
-                        print('\n  strError - column "%s" or "%s" or "%s" names not found' %(xcol,ycol,zcol))#+str(n)+'\n')
-    
-        except:
+            with open(index_file, 'r') as f:
+                old = json.load(f)['dirs']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    new = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=scan_threads) as pool:
+        # stat the indexed directories, those left unchanged are not listed again
+        rels = list(old)
+        paths = [os.path.join(root, rel) if rel else root for rel in rels]
+        size = max(1, len(paths) // (4*scan_threads))
+        mtimes = [mtime for chunk in pool.map(_dir_mtimes, [paths[i:i+size] for i in range(0, len(paths), size)]) for mtime in chunk]
+        unchanged = {rel for rel, mtime in zip(rels, mtimes) if mtime is not None and mtime == old[rel]['mtime']}
+
+        queue = ['']
+        pending = {}
+        while queue or pending:
+            while queue:
+                rel = queue.pop()
+                if rel in unchanged:
+                    new[rel] = old[rel]
+                    queue.extend(rel + '/' + name if rel else name for name in old[rel]['dirs'])
+                else:
+                    pending[pool.submit(_scan_dir, root, rel, patterns)] = rel
+            if not pending:
+                break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                rel = pending.pop(future)
+                entry = future.result()
+                if entry is None:
+                    continue
+                new[rel] = entry
+                queue.extend(rel + '/' + name if rel else name for name in entry['dirs'])
+
+    if new != old:
+        try:
+            os.makedirs(os.path.dirname(index_file), exist_ok=True)
+            tmp = index_file + '.tmp{}'.format(os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump({'root': root, 'patterns': patterns, 'dirs': new}, f)
+            os.replace(tmp, index_file)
+        except OSError:
+            pass
+
+    found = []
+    for rel, entry in new.items():
+        for name in entry['files']:
+            found.append(rel + '/' + name if rel else name)
+    return sorted(found)
+
+def find_files(dirs, patterns, reindex=False):
+    """
+        Look for the files matching the patterns anywhere under the passed directories.
+
+        Parameters:
+            dirs:           list of directories, other paths are skipped
+            patterns:       list of the patterns, e.g. LOGS*/history.data
+            reindex:        ignore the index and list every directory again
+
+        Returns:
+            list of the files found, without duplicates, in the order of dirs
+    """
+    found = []
+    seen = set()
+    for directory in dirs:
+        if not os.path.isdir(directory):
             continue
-            # print('\nError loading ' + file + ' file ')#+str(n)+'\n')
-    
-    for arg in sys.argv:
-        if use_columns == 2:
-            if (str(arg) == '-xlog'): ax1.set_xscale('log')
-            if (str(arg) == '-ylog'): ax1.set_yscale('log')
-            adjust_ylim(ax=ax1)
+        for rel in discover(directory, patterns, reindex=reindex):
+            path = os.path.normpath(os.path.join(directory, rel))
+            if path not in seen:
+                seen.add(path)
+                found.append(path)
+    return found
+
+def search_for_hist(files, patterns=None, reindex=False):
+    """
+        Look for the history.data files in the passed directories.
+
+        Parameters:
+            files:          list of directories
+            patterns:       list of the patterns of the files to look for, history_patterns by default
+            reindex:        ignore the index and list every directory again
+
+        Returns:
+            list of the history.data files found
+    """
+    return find_files(files, patterns or history_patterns, reindex=reindex)
+
+### Profiles ###
+################
+# The profiles of a LOGS directory are listed in its profiles.index: one line per profile
+# holding the model number, the priority and the profile number (profile<number>.data).
+# They are selected through the index (-profiles=selection) and only the selected ones are
+# read, when plotted. Selections are comma-separated terms:
+#
+#   all            every profile (the default of -profiles)
+#   first, last    the first/last profile
+#   every:N        a profile every N models, e.g. every:50
+#   model:N        the profile closest to model number N
+#   age:X          the profile closest to star_age X (in the units of the files, e.g. age:1.2e9)
+#   priority:P     the profiles of priority P or higher
+
+class ProfileIndex:
+    """
+        Profiles of a LOGS directory as listed in its profiles.index. Only the index is read
+        here, the profiles themselves are read once plotted.
+
+        Parameters:
+            logs_dir:       directory holding the profiles.index and profile*.data files
+    """
+    def __init__(self, logs_dir):
+        self.logs_dir = str(logs_dir)
+        rows = {}
+        with open(os.path.join(self.logs_dir, 'profiles.index'), 'r') as f:
+            f.readline()
+            for line in f:
+                values = line.split()
+                if len(values) >= 3:
+                    # after a restart the model is listed again, the later profile wins
+                    rows[int(values[0])] = (int(values[1]), int(values[2]))
+        self.models = sorted(rows)
+        self.priorities = [rows[model][0] for model in self.models]
+        self.numbers = [rows[model][1] for model in self.models]
+        self._ages = None
+
+    def path(self, i):
+        """
+            Path to the i-th profile of the index (sorted on model number).
+        """
+        return os.path.join(self.logs_dir, 'profile{}.data'.format(self.numbers[i]))
+
+    def ages(self):
+        """
+            star_age of the profiles, taken from the history.data next to them if it covers all
+            their models, from the profile headers otherwise.
+        """
+        if self._ages is not None:
+            return self._ages
+        ages = None
+        try:
+            history = load_data(os.path.join(self.logs_dir, 'history.data'), columns=['model_number', 'star_age'])
+            lookup = dict(zip(history.column('model_number').astype(int).tolist(), history.column('star_age').tolist()))
+            if all(model in lookup for model in self.models):
+                ages = [lookup[model] for model in self.models]
+        except (OSError, IndexError, KeyError, ValueError):
+            pass
+        if ages is None:
+            ages = [read_header(self.path(i))[1].get('star_age', np.nan) for i in range(len(self.models))]
+        self._ages = ages
+        return ages
+
+    def select(self, selection='all'):
+        """
+            Profiles picked by a selection, see the description of the Profiles section.
+
+            Returns:
+                list of the paths to the profiles, sorted on model number
+        """
+        n = len(self.models)
+        chosen = set()
+        for term in str(selection).split(','):
+            kind, _, value = term.strip().partition(':')
+            if n == 0:
+                break
+            if kind == 'all':
+                chosen.update(range(n))
+            elif kind == 'first':
+                chosen.add(0)
+            elif kind == 'last':
+                chosen.add(n-1)
+            elif kind == 'every':
+                step = int(float(value))
+                last = None
+                for i, model in enumerate(self.models):
+                    if last is None or model - last >= step:
+                        chosen.add(i)
+                        last = model
+            elif kind == 'model':
+                model = float(value)
+                chosen.add(min(range(n), key=lambda i: abs(self.models[i] - model)))
+            elif kind == 'age':
+                age = float(value)
+                chosen.add(int(np.nanargmin(np.abs(np.array(self.ages()) - age))))
+            elif kind == 'priority':
+                chosen.update(i for i in range(n) if self.priorities[i] >= int(float(value)))
+            else:
+                raise ValueError('unknown profile selection "{}"'.format(term))
+        return [self.path(i) for i in sorted(chosen)]
+
+def select_profiles(paths, selection='all', recursive=False, reindex=False):
+    """
+        Select the profiles of many LOGS directories.
+
+        Parameters:
+            paths:          list of LOGS directories (or their profiles.index files), with
+                            recursive also any directory to look for LOGS*/profiles.index in
+            selection:      profile selection, see the description of the Profiles section
+            recursive:      look for the profiles.index files under paths
+            reindex:        with recursive, ignore the index and list every directory again
+
+        Returns:
+            list of the paths to the selected profiles
+    """
+    logs_dirs = []
+    for path in paths:
+        if os.path.basename(os.path.normpath(path)) == 'profiles.index':
+            logs_dirs.append(os.path.dirname(path) or '.')
+        elif os.path.isfile(os.path.join(path, 'profiles.index')):
+            logs_dirs.append(path)
+    if recursive:
+        logs_dirs += [os.path.dirname(path) for path in find_files(paths, ['LOGS*/profiles.index', 'profiles.index'], reindex=reindex)]
+
+    selected = []
+    for logs_dir in dict.fromkeys(os.path.normpath(path) for path in logs_dirs):
+        selected += ProfileIndex(logs_dir).select(selection)
+    return selected
+
+def is_profile(file):
+    """
+        Check whether a file is a MESA profile, going by its name.
+    """
+    import fnmatch
+    return fnmatch.fnmatch(os.path.basename(str(file)), 'profile*.data')
+
+class LRUCache(OrderedDict):
+    """
+        Dictionary holding at most maxsize items, dropping the least recently used ones.
+    """
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+### Binary systems ###
+########################
+# A MESA binary run writes the histories of the two stars to LOGS1/history.data and
+# LOGS2/history.data and that of the orbit to binary_history.data, next to them. With -binary
+# the three are loaded once per run and joined on model_number, and the columns are taken
+# from any of them by a prefix: 1:log_L, 2:log_L, b:period_days. Columns without a prefix are
+# looked for in binary_history.data first, then in the histories of star 1 and star 2.
+
+binary_patterns = ['binary_history.data', 'LOGS1/history.data', 'LOGS2/history.data']
+binary_components = {'1': os.path.join('LOGS1', 'history.data'), '2': os.path.join('LOGS2', 'history.data'), 'b': 'binary_history.data'}
+
+def binary_run(path):
+    """
+        Run directory of a binary, given the directory itself or any of its history files.
+    """
+    if os.path.isdir(path):
+        return os.path.normpath(path)
+    directory = os.path.dirname(path) or '.'
+    if os.path.basename(os.path.abspath(directory)) in ('LOGS1', 'LOGS2'):
+        directory = os.path.dirname(directory) or '.'
+    return os.path.normpath(directory)
+
+class BinaryTable(MesaTable):
+    """
+        The histories of a binary run joined on model_number: only the models present in all
+        of them are kept, aligned by a single np.intersect1d per history. Each history is a
+        MesaTable parsing only the columns asked for, the joined columns are kept until the
+        histories get new rows.
+
+        Parameters:
+            run:            run directory holding LOGS1, LOGS2 and binary_history.data
+            columns:        list of column keys with or without a prefix, see the section notes
+            cache, stream:  see MesaTable
+            where:          row conditions on the joined columns, e.g. b:period_days<10
+    """
+    def __init__(self, run, columns=None, cache=False, stream=None, where=None):
+        self.file_name = run
+        self.components = {}
+        for prefix, file in binary_components.items():
+            path = os.path.join(run, file)
+            if os.path.exists(path):
+                self.components[prefix] = MesaTable(path, columns=[], cache=cache, stream=stream)
+        if not self.components:
+            raise FileNotFoundError('no LOGS1/history.data, LOGS2/history.data or binary_history.data in ' + run)
+        main = self.components.get('b') or next(iter(self.components.values()))
+        self.header_data = main.header_data
+        self.bulk_names = [prefix + ':' + name for prefix, table in self.components.items() for name in table.bulk_names]
+        self._index = {}
+        self._cache = None
+        self._where = [parse_condition(condition) if isinstance(condition, str) else tuple(condition) for condition in where] if where else None
+        self._joined = {}   # column key -> joined values
+        self._rows = None   # prefix -> rows of the models kept
+        self.load(columns or [])
+
+    def _split(self, key):
+        """
+            History and column key of a prefixed key.
+        """
+        if isinstance(key, str) and key[:2] in ('1:', '2:', 'b:'):
+            prefix, name = key[0], key[2:]
+            if prefix not in self.components:
+                raise KeyError('{} not found in {}'.format(binary_components[prefix], self.file_name))
+            return prefix, int(float(name)) if try_float(name) else name
+        for prefix in ('b', '1', '2'):
+            if prefix in self.components and self.components[prefix].in_data(key):
+                return prefix, key
+        raise KeyError('column "{}" not found in {}'.format(key, self.file_name))
+
+    def load(self, keys):
+        keys = list(keys) + [key for key, comparison, value in self._where or []]
+        wanted = {}
+        for key in keys:
+            prefix, name = self._split(key)
+            wanted.setdefault(prefix, []).append(name)
+        for prefix, table in self.components.items():
+            # model_number joins the histories
+            table.load(wanted.get(prefix, []) + ['model_number'])
+        if self._rows is None:
+            self._join()
+
+    def _join(self):
+        """
+            Rows of each history holding the models present in all of them (and matching where).
+        """
+        numbers = {prefix: table.column('model_number') for prefix, table in self.components.items()}
+        common = None
+        for values in numbers.values():
+            # the backups are dropped already, so the model numbers are unique
+            common = values if common is None else np.intersect1d(common, values, assume_unique=True)
+        self._rows = {prefix: np.intersect1d(common, values, assume_unique=True, return_indices=True)[2]
+                      for prefix, values in numbers.items()}
+        self._joined = {}
+        if self._where:
+            mask = np.ones(len(common), dtype=bool)
+            for key, comparison, value in self._where:
+                mask &= row_comparisons[comparison](self.column(key), value)
+            self._rows = {prefix: rows[mask] for prefix, rows in self._rows.items()}
+            self._joined = {}
+
+    def update(self):
+        """
+            Parse the rows appended to the histories and join them again.
+
+            Returns:
+                number of the new rows of the histories
+        """
+        new_rows = sum(table.update() for table in self.components.values())
+        if new_rows:
+            self._join()
+        return new_rows
+
+    def col_index(self, key):
+        prefix, name = self._split(key)
+        return self.components[prefix].col_index(name)
+
+    def name(self, key):
+        prefix, name = self._split(key)
+        return prefix + ':' + self.components[prefix].name(name)
+
+    def in_data(self, key):
+        try:
+            prefix, name = self._split(key)
+        except (KeyError, ValueError):
+            return False
+        return self.components[prefix].in_data(name)
+
+    def column(self, key):
+        if key not in self._joined:
+            prefix, name = self._split(key)
+            self._joined[key] = self.components[prefix].column(name)[self._rows[prefix]]
+        return self._joined[key]
+
+    def __len__(self):
+        return len(self.bulk_names)
+
+def load_binaries(runs, columns=None, jobs=1, cache=True, stream=None, where=None):
+    """
+        Load binary runs, each as a single BinaryTable, in parallel if jobs > 1 (see load_files()).
+
+        Returns:
+            dictionary run -> BinaryTable object, or the exception raised while loading that run
+    """
+    return load_files(runs, columns=columns, jobs=jobs, cache=cache, stream=stream, where=where, binary=True)
+
+def parse_jobs(args, i):
+    """
+        Number of worker processes given via -j N, -jN or -j alone to use all the available cores.
+
+        Parameters:
+            args:           list of the terminal arguments
+            i:              position of the -j argument
+    """
+    arg = str(args[i])
+    if try_float(arg[2:].lstrip('=')):
+        return int(arg[2:].lstrip('='))
+    if i+1 < len(args) and try_float(args[i+1]):
+        return int(args[i+1])
+    return os.cpu_count() or 1
+
+### Track comparison ###
+########################
+# The tracks of a grid (e.g. found with -r) are compared at equal x, e.g. log_L at equal
+# star_age or at equal center_h1, by interpolating all of them onto a shared x grid at once.
+# The result is a TrackStack holding a (n_models, n_points) array, from which the differences
+# and ratios to a reference track and the envelope and percentile bands of the grid follow
+# without interpolating again:
+#
+#   stack = MesaPlotter().stack(PlotSpec(['grid'], 'star_age:log_L', recursive=True))
+#   stack.values          # log_L of every model at stack.grid
+#   stack.difference()    # log_L - log_L of the first model
+
+resample_points = 500 # number of points of the shared x grid
+compare_kinds = ('diff', 'ratio', 'band')
+compare_bands = (16, 84) # percentiles of the inner band of -compare=band
+
+def resample(tracks, grid):
+    """
+        Interpolate many tracks onto the same x values with a single np.interp call. The
+        tracks are laid end to end, each shifted along x past the previous one, so one
+        increasing x array covers all of them and the grid is looked up in all of them at once.
+
+        Parameters:
+            tracks:         list of (x, y) arrays, x being monotonic (e.g. star_age or
+                            center_h1), otherwise the rows are sorted by x
+            grid:           increasing x values
+
+        Returns:
+            array of shape (len(tracks), len(grid)), NaN outside the x range of a track
+    """
+    grid = np.asarray(grid, dtype=float)
+    xs, ys, lo, hi = [], [], [], []
+    for x, y in tracks:
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        valid = np.isfinite(x) & np.isfinite(y)
+        x, y = x[valid], y[valid]
+        if np.any(x[1:] < x[:-1]):
+            order = np.arange(len(x))[::-1] if np.all(x[1:] <= x[:-1]) else np.argsort(x, kind='stable')
+            x, y = x[order], y[order]
+        xs.append(x)
+        ys.append(y)
+        lo.append(x[0] if len(x) else np.inf)
+        hi.append(x[-1] if len(x) else -np.inf)
+    lo, hi = np.array(lo), np.array(hi)
+
+    values = np.full((len(xs), len(grid)), np.nan)
+    filled = np.isfinite(lo)
+    if not filled.any() or not len(grid):
+        return values
+    # relative to the start of the x range, so that the shifts do not eat the precision of x
+    start = min(lo[filled].min(), grid[0])
+    span = max(hi[filled].max(), grid[-1]) - start
+    shift = 2*span + 1
+    offsets = np.arange(len(xs))*shift
+    x = np.concatenate([track - start + offset for track, offset in zip(xs, offsets)])
+    y = np.concatenate(ys)
+    rows = np.flatnonzero(filled)
+    queries = (grid - start)[None, :] + offsets[rows, None]
+    values[rows] = np.interp(queries.ravel(), x, y).reshape(len(rows), len(grid))
+    values[(grid[None, :] < lo[:, None]) | (grid[None, :] > hi[:, None])] = np.nan
+    return values
+
+class TrackStack:
+    """
+        Tracks of many files interpolated onto a shared x grid, see resample().
+
+        Parameters:
+            files:          files of the tracks, in the order of the rows
+            xkey, ykey:     columns (or expressions) interpolated
+            grid:           x values shared by the tracks
+            values:         array of shape (len(files), len(grid)) of the y values, NaN where
+                            a track does not cover the grid
+    """
+    def __init__(self, files, xkey, ykey, grid, values):
+        self.files = list(files)
+        self.xkey = xkey
+        self.ykey = ykey
+        self.grid = grid
+        self.values = values
+
+    def difference(self, reference=0):
+        """
+            y of every track minus y of the track at position reference.
+        """
+        return self.values - self.values[reference]
+
+    def ratio(self, reference=0):
+        """
+            y of every track divided by y of the track at position reference.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.values / self.values[reference]
+
+    def percentiles(self, q):
+        """
+            Percentiles q (0-100, a number or a list) of the tracks at every point of the
+            grid, NaN where no track covers it.
+        """
+        with warnings.catch_warnings():
+            # the points outside all the tracks are left NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanpercentile(self.values, q, axis=0)
+
+    def save(self, file):
+        """
+            Write the stack to a .npz file (arrays grid, values, files, xkey and ykey), for use
+            outside MESAplot, e.g. np.load(file)['values'].
+        """
+        np.savez(file, grid=self.grid, values=self.values, files=np.array(self.files),
+                 xkey=str(self.xkey), ykey=str(self.ykey))
+
+def stack_tracks(tables, xkey, ykey, n_points=None, xlog=False):
+    """
+        Interpolate the ykey tracks of the tables onto n_points values of xkey spanning all
+        the tracks (evenly spaced in log if xlog).
+
+        Parameters:
+            tables:         dictionary file -> MesaTable object
+            n_points:       number of points of the grid, resample_points by default
+
+        Returns:
+            TrackStack object
+    """
+    if n_points is None:
+        n_points = resample_points
+    files = list(tables)
+    tracks = [(tables[file].column(xkey), tables[file].column(ykey)) for file in files]
+    lo, hi = column_range(tables.values(), xkey)
+    if xlog:
+        # the non-positive x values have no place on a log axis
+        lo = min((np.nanmin(x[x > 0]) for x, y in tracks if np.any(x > 0)), default=np.inf)
+    if not (np.isfinite(lo) and np.isfinite(hi)):
+        grid = np.array([])
+    elif xlog:
+        grid = np.geomspace(lo, hi, n_points)
+    else:
+        grid = np.linspace(lo, hi, n_points)
+    return TrackStack(files, xkey, ykey, grid, resample(tracks, grid))
+
+### Plotter ###
+###############
+# A plot is described by a PlotSpec and drawn by a MesaPlotter, which keeps the loaded
+# tables, so that many plots (or refreshes of one plot) parse every file only once.
+# The terminal interface below only translates its arguments into a PlotSpec, e.g.
+#
+#   plotter = MesaPlotter(jobs=4)
+#   plotter.render(PlotSpec(['M1.0/LOGS/history.data'], 'log_Teff:log_L'))
+#   plotter.render(PlotSpec(['M1.0/LOGS/history.data'], 'star_age:log_R', output='R.pdf'))
+
+# line styles of the -wl, -wp and -wlp options
+line_styles = {
+    'wl':  dict(linestyle='solid', linewidth=4, ms=0,  marker=None, alpha=0.8),
+    'wp':  dict(linestyle=None,    linewidth=0, ms=5,  marker='.',  alpha=1.),
+    'wlp': dict(linestyle='solid', linewidth=2, ms=10, marker='.',  alpha=0.7),
+}
+
+def parse_columns(columns, binary=False):
+    """
+        Split a column selection like 3:4 or log_Teff:log_L:log_R into column keys. In the
+        binary mode 1, 2 and b followed by another key are the prefix of that key, e.g.
+        b:age:1:log_L gives b:age and 1:log_L (see the Binary systems section).
+
+        Returns:
+            list of column numbers (counting from 1, negative for an inverted axis) and/or names
+    """
+    keys = str.rsplit(str(columns), sep=":")
+    if binary:
+        joined = []
+        while keys:
+            key = keys.pop(0)
+            if key in binary_components and keys:
+                key += ':' + keys.pop(0)
+            joined.append(key)
+        return joined
+    return [int(float(key)) if try_float(key) else key for key in keys]
+
+def parse_pairs(selection, binary=False):
+    """
+        Split a column selection of the mu mode into x:y pairs. Besides x:y, the shorthand
+        x:y1:y2:... plots every y column against the same x, e.g. star_age:log_L:log_Teff:log_R.
+
+        Returns:
+            list of (x, y) tuples of column keys
+    """
+    keys = parse_columns(selection, binary) if isinstance(selection, str) else list(selection)
+    if len(keys) < 2:
+        raise ValueError('column selection ' + str(selection) + ' needs at least 2 columns')
+    return [(keys[0], ykey) for ykey in keys[1:]]
+
+def facet_value(file, key):
+    """
+        Value of a grid parameter parsed from the directory names of a file, e.g. 1.5 for the
+        key M of grid/Z0.014/M1.5/LOGS/history.data. Also matches M_1.5, M=1.5 and LOGS_M1.5,
+        the innermost directory wins.
+
+        Returns:
+            value as float, None if no directory carries the key
+    """
+    import re
+    pattern = r'(?:^|[^A-Za-z])' + re.escape(key) + r'[=_]?([-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)(?![A-Za-z])'
+    values = re.findall(pattern, os.path.dirname(os.path.abspath(file)).replace(os.sep, '/'))
+    return float(values[-1]) if values else None
+
+def is_selection(arg):
+    """
+        Check whether a terminal argument is a column selection, e.g. 1:2, -3:4 or star_age:log_L,
+        rather than a row condition like b:period_days<5.
+    """
+    return ':' in arg and (arg[0] != '-' or try_float(arg.split(':')[0])) and \
+           not any(comparison in arg for comparison in row_comparisons)
+
+def is_inverted(key):
+    """
+        Check whether the axis of a column is inverted: negative column numbers and log_Teff.
+    """
+    if isinstance(key, str):
+        return key == 'log_Teff'
+    return key < 0
+
+def column_range(tables, key):
+    """
+        Range of a column over many tables, skipping those that failed to load or lack the column.
+
+        Returns:
+            minimum and maximum of the column, (inf, -inf) if no table has it
+    """
+    value_min, value_max = np.inf, -np.inf
+    for table in tables:
+        if not isinstance(table, MesaTable) or not table.in_data(key):
+            continue
+        values = table.column(key)
+        if np.isfinite(values).any():
+            value_min = min(value_min, np.nanmin(values))
+            value_max = max(value_max, np.nanmax(values))
+    return value_min, value_max
+
+@dataclass
+class PlotSpec:
+    """
+        Description of a single plot, independent of any figure or loaded data.
+
+        Parameters:
+            files:          list of MESA .data files (or directories if recursive)
+            columns:        column selection x:y[:z[:c]], either as a string or as a list of
+                            column numbers (counting from 1, negative to invert the axis)
+                            and/or names. A list of x:y (or x:y1:y2:...) selections in the
+                            mu mode, or a string of them separated by spaces
+            mode:           u, us (size map), uc (color map) or mu (many x:y pairs)
+            style:          wl, wp or wlp (lines, points, lines and points)
+            recursive:      look for LOGS*/history.data files in the directories of files
+            patterns:       patterns of the files looked for if recursive, history_patterns by default
+            profiles:       plot the profiles of the LOGS directories in files picked by this
+                            selection (see the Profiles section) instead of the files
+            legend:         add the legend (up to 20 files)
+            panels:         mu mode only, draw each x:y pair in its own panel of a grid
+                            sharing the x axis instead of all on one axis
+            where:          list of row conditions like center_h1<1e-4 or star_age>=1e9, only
+                            the rows matching all of them are loaded and plotted
+            binary:         plot binary runs, files being their directories or history files,
+                            with the columns prefixed by 1:, 2: or b: (see the Binary systems section)
+            facet:          grid parameter (e.g. M or Z) parsed from the directory names by
+                            facet_value(), the files go in one panel per value, all the panels
+                            sharing the axes. Only x:y (and the colour of uc) are drawn
+            compare:        diff, ratio or band: interpolate the x:y tracks onto a shared x grid
+                            (see the Track comparison section) and draw their differences or
+                            ratios to the first track, or the envelope, percentile band and
+                            median of all of them. Only x:y is drawn
+            xlog, ylog:     log scale on the x and y axes
+            equal_ylim:     set the limits of the twin y axis equal to the primary ones
+            cursor:         add the cross hair cursor
+            output:         save the plot under this file name
+    """
+    files: list
+    columns: list = field(default_factory=lambda: [1, 2])
+    mode: str = 'u'
+    style: str = 'wl'
+    recursive: bool = False
+    patterns: list = None
+    profiles: str = None
+    legend: bool = include_legend
+    panels: bool = False
+    facet: str = None
+    compare: str = None
+    where: list = None
+    binary: bool = False
+    xlog: bool = False
+    ylog: bool = False
+    equal_ylim: bool = False
+    cursor: bool = False
+    output: str = None
+
+    def __post_init__(self):
+        if isinstance(self.files, str):
+            self.files = [self.files]
+        if isinstance(self.where, str):
+            self.where = [self.where]
+        if self.mode == 'mu':
+            if isinstance(self.columns, str):
+                self.columns = self.columns.split()
+            self.columns = [pair for selection in self.columns for pair in parse_pairs(selection, self.binary)]
+        elif isinstance(self.columns, str):
+            self.columns = parse_columns(self.columns, self.binary)
+
+    def plot_files(self, reindex=False):
+        """
+            Files to plot, in the order they are plotted. With reindex, the directories are
+            listed again instead of using the index of the patterns looked for (see discover()).
+        """
+        if self.profiles is not None:
+            return select_profiles(self.files, self.profiles, recursive=self.recursive, reindex=reindex)
+        files = list(self.files)
+        if self.recursive:
+            # the directories are only searched, the files found in them are plotted
+            files = [file for file in files if not os.path.isdir(file)]
+        if self.binary:
+            # one entry per run, holding all its histories
+            if self.recursive:
+                files += search_for_hist(self.files, self.patterns or binary_patterns, reindex=reindex)
+            return list(dict.fromkeys(binary_run(file) for file in files))
+        if self.recursive:
+            files += search_for_hist(self.files, self.patterns, reindex=reindex)
+        return files
+
+    def mu_panels(self):
+        """
+            Check whether the x:y pairs of the mu mode go in panels of their own.
+        """
+        return self.mode == 'mu' and self.panels and not self.facet
+
+    def pairs(self):
+        """
+            x:y pairs plotted on the primary axis.
+        """
+        if self.mode == 'mu':
+            return list(self.columns)
+        return [tuple(self.columns[:2])]
+
+    def load_columns(self):
+        """
+            Columns required by the plot, only these are parsed from the files.
+        """
+        if self.mode == 'mu':
+            # the x column shared by the pairs is parsed once
+            return list(dict.fromkeys(key for pair in self.columns for key in pair))
+        return list(self.columns)
+
+class MesaPlotter:
+    """
+        Draws PlotSpecs. The parsed tables are kept between the renders, so re-plotting the
+        same files with other columns only parses the new columns, and refreshing a plot only
+        parses the rows appended to the files since. Profiles are kept in a bounded LRU cache
+        instead (the profile_cache_size most recently plotted), as there may be thousands.
+
+        Parameters:
+            cache:          use the on-disk column cache
+            jobs:           number of worker processes used to load the files
+            lod:            decimate the long tracks to the screen resolution
+            stream:         stream the files in bounded memory, by default only those larger
+                            than stream_min_size (see RowReducer)
+    """
+    def __init__(self, cache=True, jobs=1, lod=True, stream=None):
+        self.cache = cache
+        self.stream = stream
+        self.jobs = jobs
+        self.lod = lod
+        self.lod_scale = 1. # pixels per screen pixel of the target (dpi of the saved figure / screen dpi)
+        self.tables = {}    # file -> MesaTable object, or the exception raised while loading it
+        self.profiles = LRUCache(profile_cache_size) # the same for the profiles
+        self.tracks = []
+        self.fig = None
+        self.ax1 = None
+        self.ax2 = None
+        self.panels = []    # axes of the small multiples of the mu mode, [ax1] otherwise
+        self.cursor = None
+        self.spec = None
+        self.plotted_files = []
+        self.plotted = 0      # number of the files drawn by the last render
+        self.errors = {}      # file -> error message of the files the last render could not draw
+        self.notes = []       # what the last render left out of the plot (columns, legend)
+        self._lod_timer = None
+        self._size_range = None
+        self._size_title = None
+        self._color_norm = None
+        self._legend_handles = {} # legend proxies of the artists whose own legend entry is meaningless
+        self._sequence = None # spec, profiles and position of the profile shown by step()
+        self._stacks = {}     # tracks interpolated onto a shared grid, see stack()
+
+    def _store(self, file):
+        return self.profiles if is_profile(file) else self.tables
+
+    def _key(self, file, where=None, binary=False):
+        # the rows of a table depend on the row conditions, a file is kept once for each of them
+        return (file, tuple(where or ()), binary) if where or binary else file
+
+    def load(self, files, columns=None, where=None, binary=False):
+        """
+            Load the files not loaded yet and parse the missing columns of the others.
+
+            Parameters:
+                files:      list of paths to the MESA .data files
+                columns:    list of column numbers and/or names to parse
+                where:      row conditions, see load_data()
+                binary:     files are binary runs, loaded as BinaryTable objects
+
+            Returns:
+                dictionary file -> MesaTable object, or the exception raised while loading that file
+        """
+        # the tables are fetched before anything is stored, storing may evict profiles from the LRU cache
+        cached = {file: self._store(file).get(self._key(file, where, binary)) for file in files}
+        missing = [file for file in files if not isinstance(cached[file], MesaTable)]
+        if binary:
+            loaded = load_binaries(missing, columns=columns, jobs=self.jobs, cache=self.cache, stream=self.stream, where=where)
         else:
-            if (str(arg) == '-xlog'): ax1.set_xscale('log')
-            if (str(arg) == '-ylog'): ax1.set_yscale('log')
-            if (str(arg) == '-ylog'): ax2.set_yscale('log')
-    
-        # set min and max bounds for yaxes 
-        # print(ax1.get_ylim())
-        # print(ax2.get_ylim()[0])
-        # if min.ax1 < min.ax2:
-    
-            if (2. > ax1.get_ylim()[0] / ax2.get_ylim()[0] > 0.5 or 2. > ax2.get_ylim()[0] / ax1.get_ylim()[0] > 0.5 and \
-                2. > ax1.get_ylim()[1] / ax2.get_ylim()[1] > 0.5 or 2. > ax2.get_ylim()[1] / ax1.get_ylim()[1] > 0.5 ):
-                if ax1.get_ylim()[0] < ax2.get_ylim()[0]: 
-                    min_lim_bound = ax1.get_ylim()[0]
-                else:
-                    min_lim_bound = ax2.get_ylim()[0]
-                # if max.ax1 < max.ax2:
-                if ax1.get_ylim()[1] < ax2.get_ylim()[1]: 
-                    max_lim_bound = ax2.get_ylim()[1]
+            loaded = load_files(missing, columns=columns, jobs=self.jobs, cache=self.cache, stream=self.stream, where=where)
+        tables = {}
+        for file in files:
+            if file in loaded:
+                table = loaded[file]
+            else:
+                table = cached[file]
+                if columns is not None:
+                    try:
+                        table.load(columns)
+                    except Exception as e:
+                        table = e
+            self._store(file)[self._key(file, where, binary)] = table
+            tables[file] = table
+        return tables
+
+    def render(self, spec, fig=None):
+        """
+            Draw the plot described by spec, replacing the previous plot of this plotter.
+
+            Parameters:
+                spec:       PlotSpec object
+                fig:        matplotlib figure to draw into, a new one by default
+
+            Returns:
+                matplotlib figure. The number of the files drawn is left in plotted, the
+                errors of the files that could not be drawn in errors and what was left out
+                of the plot in notes (nothing is printed, see report())
+        """
+        files = spec.plot_files()
+        self.notes = []
+        if spec.facet and spec.mode != 'mu' and len(spec.columns) > 2 + (spec.mode == 'uc'):
+            self.notes.append('-facet draws only x:y' + (' and the colour' if spec.mode == 'uc' else '') + ', the other columns are left out')
+            spec = replace(spec, columns=spec.columns[:2] + (spec.columns[-1:] if spec.mode == 'uc' else []))
+        if spec.compare and (spec.mode != 'u' or len(spec.columns) > 2 or spec.facet):
+            self.notes.append('-compare draws only x:y, the other columns are left out')
+            spec = replace(spec, mode='u', columns=list(spec.pairs()[0]), facet=None, panels=False)
+        tables = self.load(files, spec.load_columns(), spec.where, spec.binary)
+        facets = self._facets(spec, tables) if spec.facet else None
+        if facets is not None:
+            panel_of = {file: i for i, facet_files in enumerate(facets.values()) for file in facet_files}
+            self._new_axes(fig, max(len(facets), 1), sharey=True)
+        else:
+            self._new_axes(fig, len(spec.pairs()) if spec.mu_panels() else 1)
+        self._sequence = (spec, files, None) if spec.profiles is not None else None
+        self.spec = spec
+        self.plotted_files = files
+        self._size_range = None
+        if spec.mode == 'us' and len(spec.columns) > 2:
+            # first pass of the size map: one scale for all the files
+            self._size_range = column_range(tables.values(), spec.columns[2])
+        self._color_norm = None
+        self._legend_handles = {}
+        if spec.mode == 'uc' and len(spec.columns) > 2:
+            # one colour scale for all the files
+            self._color_norm = self._norm(tables.values(), spec.columns[-1])
+
+        numer_of_files = 0
+        self.errors = {}
+        for file, table in tables.items():
+            if spec.compare and not isinstance(table, Exception):
+                # drawn all at once below
+                continue
+            if isinstance(table, Exception):
+                self.errors[file] = str(table) or table.__class__.__name__
+                continue
+            if facets is not None:
+                # the plotting methods draw into ax1
+                self.ax1 = self.panels[panel_of[file]]
+            try:
+                if spec.mode == 'mu' or len(spec.columns) == 2:
+                    self._plot_xy(spec, file, table)
+                elif spec.mode == 'us':
+                    self._plot_size_map(spec, file, table)
+                elif spec.mode == 'uc':
+                    self._plot_color_map(spec, file, table)
                 else:
-                    max_lim_bound = ax1.get_ylim()[1]
-                
-                ax1.set_ylim(min_lim_bound, max_lim_bound)
-                ax2.set_ylim(min_lim_bound, max_lim_bound)
-    
-            if equal_ylim and len(split_cols) > 2:
-                ax2.set_ylim(ax1.set_ylim())
-    
-            adjust_ylim(ax=ax1)
-            adjust_ylim(ax=ax2)
-    
-    
-    
-    # ax1.grid(alpha=0.3)
-    # ax2.grid(alpha=0.2, linestyle='dashed')
-    
-    if include_legend:
-    # usuń starą legendę, jeśli istnieje
-        leg = ax1.get_legend()
-        if leg is not None:
-            leg.remove()
-
-        if numer_of_files <= 20:
-            legend = ax1.legend(loc="best", fontsize=legend_fontsize, markerscale=markerscale)
-            # change the line width for the legend, no matter what linewidths are used in the plot
-            for line in legend.get_lines():
-                line.set_linewidth(legend_linewidth)
+                    self._plot_twin(spec, file, table)
+                numer_of_files += 1
+            except (IndexError, KeyError, ValueError) as e:
+                self.errors[file] = str(e) or e.__class__.__name__
+        self.ax1 = self.panels[0]
+        if facets is not None:
+            self._facet_labels(spec, list(facets))
+        if spec.compare:
+            try:
+                numer_of_files = self._plot_compare(spec, tables)
+                compared = self.stack(spec).files
+                for file, table in tables.items():
+                    if isinstance(table, MesaTable) and file not in compared:
+                        self.errors[file] = 'no column ' + ' or '.join(map(str, spec.pairs()[0]))
+            except (IndexError, KeyError, ValueError) as e:
+                self.errors.update({file: str(e) for file, table in tables.items() if isinstance(table, MesaTable)})
+        self.plotted = numer_of_files
+
+        self._set_axes(spec)
+        if self._size_range is not None and self.ax2 is not None:
+            self._size_legend(spec)
+        if self._color_norm is not None:
+            self._colorbar(spec, tables)
+
+        if spec.legend and facets is None:
+            if numer_of_files <= 20:
+                handles, labels = self.ax1.get_legend_handles_labels()
+                handles = [self._legend_handles.get(handle, handle) for handle in handles]
+                legend = self.ax1.legend(handles, labels, loc="best", fontsize=legend_fontsize, markerscale=markerscale)
+                # change the line width for the legend, no matter what linewidths are used in the plot
+                for line in legend.get_lines():
+                    line.set_linewidth(legend_linewidth)
+            else:
+                self.notes.append("A number of arguments to plot exceed the allowed number to accommodate legend.")
+
+        for ax in self.panels + [self.ax2]:
+            self._lod_connect(ax)
+
+        if spec.output:
+            self.save(spec.output)
+
+        if spec.cursor:
+            # parse the columns shown by the cross hair readout now rather than on the first mouse move
+            for track in self.tracks:
+                for name in ('model_number', 'star_age'):
+                    if track.table.in_data(name):
+                        track.table.column(name)
+            # the cross hair snaps to the tracks under it, not to those of the other panels
+            tracks = [track for track in self.tracks if track.line.axes in (self.ax1, self.ax2)]
+            # blitting redraws only the cross hair on mouse move, not every track in the figure
+            if self.fig.canvas.supports_blit:
+                self.cursor = BlittedCursor(self.ax1, tracks)
+            else:
+                self.cursor = Cursor(self.ax1, tracks)
+        return self.fig
+
+    def refresh(self, spec=None):
+        """
+            Re-read the files of the plot (the 'a' key). The new rows are pushed to the existing
+            lines, keeping the figure, axes, ticks, legend and twin axis as they are. The plot is
+            rebuilt only if the set of files to plot has changed (e.g. a new LOGS directory
+            showed up with -r), if another spec is given or if the plot holds artists that
+            cannot be updated in place (size map).
+        """
+        if spec is None:
+            spec = self.spec
+        if spec is self.spec and spec.mode != 'us' and spec.plot_files() == self.plotted_files:
+            self.update()
+            return
+        errors = {}
+        for table in list(self.tables.values()) + list(self.profiles.values()):
+            if isinstance(table, MesaTable):
+                try:
+                    table.update()
+                except Exception as e:
+                    errors[table.file_name] = 'cannot read the new rows: ' + str(e)
+        self._stacks.clear()
+        self.render(spec, fig=self.fig)
+        self.errors.update(errors)
+        self.fig.canvas.draw_idle()
+
+    def step(self, offset=1):
+        """
+            Show the next (offset=1) or previous (offset=-1) of the selected profiles alone,
+            e.g. on the arrow keys. The first step shows the first (or last) profile.
+
+            Returns:
+                path to the profile shown, None if the plot does not show profiles
+        """
+        if self._sequence is None:
+            return None
+        spec, files, position = self._sequence
+        if not files:
+            return None
+        if position is None:
+            position = 0 if offset > 0 else len(files)-1
+            shown = None
+        else:
+            shown = files[position]
+            position = min(max(position + offset, 0), len(files)-1)
+        file = files[position]
+
+        table = self.load([file], spec.load_columns(), spec.where)[file]
+        self._show(spec, shown, file, table, position, len(files))
+        self._sequence = (spec, files, position)
+        self.fig.canvas.draw_idle()
+        return file
+
+    def animate(self, spec, output, fps=10, dpi=100):
+        """
+            Write a movie of the files of spec, one file per frame, e.g. of a profile sequence
+            picked via spec.profiles. The lines are given the data of the next frame in place
+            and every frame is streamed to the writer (ffmpeg for .mp4 and the like, pillow for
+            .gif), while the next file is read in a background thread.
+
+            Parameters:
+                spec:       PlotSpec object
+                output:     file name of the movie
+                fps:        frames per second
+                dpi:        resolution of the frames
+
+            Returns:
+                number of frames written
+        """
+        import concurrent.futures
+        from matplotlib import animation
+
+        files = spec.plot_files()
+        if not files:
+            return 0
+        columns = spec.load_columns()
+        writer_name = 'pillow' if str(output).lower().endswith('.gif') else 'ffmpeg'
+        if not animation.writers.is_available(writer_name):
+            raise RuntimeError('no {} writer available to save {}'.format(writer_name, output))
+        writer = animation.writers[writer_name](fps=fps)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            table = self._prefetch(pool, files[0], columns, spec.where).result()
+            self._store(files[0])[self._key(files[0], spec.where)] = table
+            self._show(spec, None, files[0], table, 0, len(files))
+            with writer.saving(self.fig, str(output), dpi):
+                for position, file in enumerate(files):
+                    if position > 0:
+                        table = future.result()
+                        self._store(file)[self._key(file, spec.where)] = table
+                        self._show(spec, files[position-1], file, table, position, len(files))
+                    if position+1 < len(files):
+                        # read the next file while this frame is drawn and encoded
+                        future = self._prefetch(pool, files[position+1], columns, spec.where)
+                    writer.grab_frame()
+        return len(files)
+
+    def _prefetch(self, pool, file, columns, where=None):
+        # the store is only touched here, in the main thread
+        return pool.submit(self._read, self._store(file).get(self._key(file, where)), file, columns, where)
+
+    def _read(self, table, file, columns, where=None):
+        try:
+            if isinstance(table, MesaTable):
+                table.load(columns)
+                return table
+            return load_data(file, columns=columns, cache=self.cache, stream=self.stream, where=where)
+        except Exception as e:
+            return e
+
+    def _show(self, spec, shown, file, table, position, total):
+        """
+            Show file alone in place of the file shown, giving its data to the lines of the
+            plot if possible rather than drawing the plot again.
+        """
+        if shown is not None and spec.mode != 'us' and self.tracks and isinstance(table, MesaTable):
+            for track in self.tracks:
+                track.table = table
+                track.line.set_label(track.line.get_label().replace(shown, file))
+                track.refresh(self.lod, self.lod_scale)
+            self._rescale({track.line.axes for track in self.tracks})
+            legend = self.ax1.get_legend()
+            if legend is not None:
+                for text in legend.get_texts():
+                    text.set_text(text.get_text().replace(shown, file))
+        else:
+            self.render(replace(spec, files=[file], profiles=None, recursive=False, output=None), fig=self.fig)
+
+        if isinstance(table, MesaTable):
+            title = '{} ({}/{})'.format(file, position+1, total)
+            for name in ('model_number', 'star_age'):
+                if name in table.header_data:
+                    title += '   {} = {:.6g}'.format(name, table.header_data[name])
+            self.ax1.set_title(title, fontsize=title_fontsize)
+
+    def update(self):
+        """
+            Extend the tracks with the rows appended to their files since the last call,
+            parsing only the new rows (-follow mode and the refresh key). The files that
+            could not be read are added to errors.
+
+            Returns:
+                number of the files that got new rows
+        """
+        tables = {}
+        for track in self.tracks:
+            tables.setdefault(id(track.table), track.table)
+        if self.spec is not None and self.spec.compare:
+            # the compared lines are not tracks of the tables, they are drawn again on new rows
+            for file in self.plotted_files:
+                table = self._store(file).get(self._key(file, self.spec.where, self.spec.binary))
+                if isinstance(table, MesaTable):
+                    tables.setdefault(id(table), table)
+
+        updated = set()
+        errors = {}
+        for key, table in tables.items():
+            try:
+                if table.update():
+                    updated.add(key)
+            except Exception as e:
+                errors[table.file_name] = 'cannot read the new rows: ' + str(e)
+        self.errors.update(errors)
+        if not updated:
+            return 0
+        self._stacks.clear()
+        if self.spec.compare:
+            self.render(self.spec, fig=self.fig)
+            self.errors.update(errors)
+            self.fig.canvas.draw_idle()
+            return len(updated)
+
+        axes = set()
+        for track in self.tracks:
+            if id(track.table) in updated:
+                track.refresh(self.lod, self.lod_scale)
+                axes.add(track.line.axes)
+        self._rescale(axes)
+        if self._color_norm is not None:
+            # keep the colour scale covering the new rows
+            norm = self._norm(tables.values(), self.spec.columns[-1])
+            self._color_norm.vmin, self._color_norm.vmax = norm.vmin, norm.vmax
+        self.fig.canvas.draw_idle()
+        return len(updated)
+
+    def save(self, filename, dpi=300):
+        """
+            Save plot
+
+            Parameters:
+                filename:       save file under filename.extension
+                                if no extension provided, default to '.png'
+                dpi:            resolution of the saved figure
+        """
+        # decimate the long tracks for the resolution of the saved figure
+        self.lod_scale = dpi / self.fig.dpi
+        self._refresh_decimated()
+        try:
+            self.fig.savefig(str(filename), dpi=dpi)
+        finally:
+            self.lod_scale = 1.
+            self._refresh_decimated()
+
+    def stack(self, spec, n_points=None):
+        """
+            Tracks of the files of spec (its x:y, the first pair in the mu mode) interpolated
+            onto a shared x grid, see stack_tracks(). A stack is computed once and kept, so the
+            plots of the same tracks reuse it without interpolating again. It is dropped when
+            the files get new rows.
+
+            Returns:
+                TrackStack object, without the files that failed to load or lack the columns
+        """
+        xkey, ykey = spec.pairs()[0]
+        files = spec.plot_files()
+        if n_points is None:
+            n_points = resample_points
+        key = (tuple(files), xkey, ykey, n_points, spec.xlog, tuple(spec.where or ()), spec.binary)
+        if key not in self._stacks:
+            tables = self.load(files, [xkey, ykey], spec.where, spec.binary)
+            tables = {file: table for file, table in tables.items()
+                      if isinstance(table, MesaTable) and table.in_data(xkey) and table.in_data(ykey)}
+            self._stacks[key] = stack_tracks(tables, xkey, ykey, n_points, spec.xlog)
+        return self._stacks[key]
+
+    def _plot_compare(self, spec, tables):
+        """
+            Draw the differences or ratios of the tracks to the first one, or the band of all
+            of them, at the points of their stack.
+
+            Returns:
+                number of the tracks compared
+        """
+        style = line_styles[spec.style]
+        stack = self.stack(spec)
+        if not stack.files:
+            return 0
+        xkey, ykey = spec.pairs()[0]
+        reference = stack.files[0]
+        name = tables[reference].name(ykey)
+        self.ax1.set_xlabel(label_prefix+tables[reference].name(xkey),fontsize=fontsize,labelpad=4)
+
+        if spec.compare == 'band':
+            low, high, lower, upper, median = stack.percentiles([0, 100] + list(compare_bands) + [50])
+            self.ax1.fill_between(stack.grid, low*multiplicator, high*multiplicator, color='C0', alpha=0.2, linewidth=0,
+                                  label='min - max')
+            self.ax1.fill_between(stack.grid, lower*multiplicator, upper*multiplicator, color='C0', alpha=0.4, linewidth=0,
+                                  label='{:g} - {:g}%'.format(*compare_bands))
+            self.ax1.plot(stack.grid, median*multiplicator, color='C0', label='median of {} tracks'.format(len(stack.files)), **style)
+            self.ax1.set_ylabel(label_prefix+name,fontsize=fontsize,labelpad=4)
+            return len(stack.files)
+
+        if spec.compare == 'diff':
+            values, level = stack.difference()*multiplicator, 0
+            self.ax1.set_ylabel('$\\Delta$ '+label_prefix+name,fontsize=fontsize,labelpad=4)
+        else:
+            values, level = stack.ratio(), 1
+            self.ax1.set_ylabel(label_prefix+name+' / reference',fontsize=fontsize,labelpad=4)
+        self.ax1.axhline(level, color='grey', linestyle='dashed', linewidth=1, label=reference+' (reference)')
+        for file, row in zip(stack.files[1:], values[1:]):
+            self.ax1.plot(stack.grid, row, label=file, **style)
+        return len(stack.files)
+
+    def _facets(self, spec, tables):
+        """
+            Group the loaded files by the value of the spec.facet grid parameter.
+
+            Returns:
+                dictionary value -> list of files, in increasing order of the values, the files
+                without the parameter last (under None)
+        """
+        facets = {}
+        for file, table in tables.items():
+            if isinstance(table, MesaTable):
+                facets.setdefault(facet_value(file, spec.facet), []).append(file)
+        return dict(sorted(facets.items(), key=lambda item: (item[0] is None, item[0] or 0)))
+
+    def _facet_labels(self, spec, values):
+        """
+            Title the panels of the facets with their values and keep the axis labels on the
+            outer panels only.
+        """
+        ncols = self.ax1.get_subplotspec().get_gridspec().ncols
+        for i, (ax, value) in enumerate(zip(self.panels, values)):
+            ax.set_title('{} = {}'.format(spec.facet, '?' if value is None else '{:g}'.format(value)), fontsize=title_fontsize)
+            if i % ncols:
+                ax.set_ylabel('')
+            if i + ncols < len(self.panels):
+                ax.set_xlabel('')
+
+    def _rescale(self, axes):
+        """
+            Fit the limits of the axes to the current data of their tracks.
+        """
+        for ax in axes:
+            ax.relim()
+        for track in self.tracks:
+            if track.line.axes in axes:
+                track.extend_datalim()
+        for ax in axes:
+            ax.autoscale_view()
+
+    def _new_axes(self, fig, panels=1, sharey=False):
+        if self.cursor is not None:
+            self.cursor.disconnect()
+            self.cursor = None
+        if fig is None:
+            fig = self.fig
+        if fig is not self.fig:
+            self._lod_timer = None
+        if fig is None:
+            fig = plt.figure(figsize=(12,7))
+        else:
+            fig.clf()
+        # small multiples: a grid of panels sharing the x axis, filled row by row
+        ncols = 1 if panels <= 3 else int(np.ceil(np.sqrt(panels)))
+        nrows = -(-panels // ncols)
+        axes = fig.subplots(nrows, ncols, sharex=True, sharey=sharey, squeeze=False,
+                            gridspec_kw=dict(wspace=0.1 if sharey else 0.35)).ravel()
+        for ax in axes[panels:]:
+            fig.delaxes(ax)
+        self.panels = list(axes[:panels])
+        for i, ax in enumerate(self.panels):
+            set_ticks(ax)
+            if i + ncols >= panels:
+                # bottom panel of its column, also if the grid is not full
+                ax.tick_params(labelbottom=True)
+        self.fig = fig
+        self.ax1 = self.panels[0]
+        self.ax2 = None
+        # a new list, the cursor of the previous plot may still hold the old one
+        self.tracks = []
+
+    def _twin_axes(self):
+        # create other y axis assiming that x-axis is shared between data
+        if self.ax2 is None:
+            self.ax2 = self.ax1.twinx()
+            set_ticks(self.ax2, twin_of=self.ax1)
+        return self.ax2
+
+    def _add_track(self, lines, table, xkey, ykey, xscale=1, yscale=1):
+        """
+            Register the line(s) returned by ax.plot() as tracks.
+
+            Parameters:
+                lines:          list of Line2D objects, as returned by ax.plot()
+                table:          MesaTable object the data come from
+                xkey, ykey:     column numbers or names of the plotted columns
+                xscale, yscale: factors the columns were multiplied by
+        """
+        for line in lines:
+            track = Track(line, table, xkey, ykey, xscale=xscale, yscale=yscale)
+            self.tracks.append(track)
+            if self.lod and len(line.get_xdata()) > lod_min_points:
+                track.refresh(self.lod, self.lod_scale)
+
+    def _plot_xy(self, spec, file, table):
+        style = line_styles[spec.style]
+        pairs = spec.pairs()
+
+        if spec.mu_panels():
+            # one pair per panel, all drawn from the same parsed columns
+            axes = self.panels
+            ncols = self.ax1.get_subplotspec().get_gridspec().ncols
+            for i, (ax, (xkey, ykey)) in enumerate(zip(axes, pairs)):
+                ax.set_ylabel(label_prefix+table.name(ykey),fontsize=fontsize,labelpad=4)
+                if i + ncols >= len(axes):
+                    ax.set_xlabel(label_prefix+table.name(xkey),fontsize=fontsize,labelpad=4)
         else:
-            print("A number of arguments to plot exceed the allowed number to accommodate legend.")
-        # plt.tight_layout()
-    
-    if if_save_plot == True:
-        save_plot(save_file_name)
-    
-    if if_crosshair_cursor == True:
-        # Simulate a mouse move to (0.5, 0.5), needed for online docs
-        from matplotlib.backend_bases import MouseEvent
-        # blitted_cursor = BlittedCursor(ax1)
-        # fig.canvas.mpl_connect('motion_notify_event', blitted_cursor.on_mouse_move)
-        # cursor = Cursor(ax1)
-        # fig.canvas.mpl_connect('motion_notify_event', cursor.on_mouse_move)
-    
-        # t = ax1.transData
-    
-        if (type == 'int'):
-            # print('int')
-            cursor = Cursor(ax1, 'int')
-            fig.canvas.mpl_connect('motion_notify_event', cursor.on_mouse_move)
-    
-            t = ax1.transData
-            MouseEvent(
-                "motion_notify_event", ax1.figure.canvas, *t.transform((p[abs(int(xcol))-1][0], p[abs(int(ycol))-1][0]))
-            )._process()
-        elif (type == 'str'):
-            # print('str')
-            cursor = Cursor(ax1, 'str')
-            fig.canvas.mpl_connect('motion_notify_event', cursor.on_mouse_move)
-    
-            t = ax1.transData
-            # ax1.plot(getattr(p, xcol), getattr(p, ycol)*multiplicator, linewidth=lw, linestyle=ls, alpha=alpha, ms=ms, marker=marker, label=file)
-            MouseEvent(
-                "motion_notify_event", ax1.figure.canvas, *t.transform((getattr(p, xcol)[0], getattr(p, ycol)[0]))
-            )._process()
-    # p[abs(int(xcol))-1][0], p[abs(int(ycol))-1][0]
-    
-    # print(numer_of_files)
-
-    # Ensure the title mentions the refresh option once at startup
+            axes = [self.ax1]*len(pairs)
+            self.ax1.set_xlabel(label_prefix+table.name(pairs[0][0]),fontsize=fontsize,labelpad=4)
+            self.ax1.set_ylabel(label_prefix+', '.join(table.name(ykey) for xkey, ykey in pairs),fontsize=fontsize,labelpad=4)
+
+        for ax, (xkey, ykey) in zip(axes, pairs):
+            label = file+' '+table.name(ykey) if spec.mode == 'mu' and not spec.mu_panels() else file
+            self._add_track(ax.plot(table.column(xkey), table.column(ykey)*multiplicator, label=label, **style),
+                            table, xkey, ykey, yscale=multiplicator)
+
+    def _plot_twin(self, spec, file, table):
+        style = line_styles[spec.style]
+        xkey, ykey, zkey = spec.columns[:3]
+        ax2 = self._twin_axes()
+
+        # handle axes labels
+        self.ax1.set_xlabel(label_prefix+table.name(xkey),fontsize=fontsize,labelpad=4)
+        self.ax1.set_ylabel(label_prefix+table.name(ykey),fontsize=fontsize,labelpad=4)
+        ax2.set_ylabel(label_prefix+table.name(zkey),fontsize=fontsize,labelpad=4)
+
+        x = table.column(xkey)
+        self._add_track(self.ax1.plot(x, table.column(ykey)*multiplicator, label=file, **style), table, xkey, ykey, yscale=multiplicator)
+        self._add_track(ax2.plot(x, table.column(zkey), linewidth=2.0, linestyle='dashed', alpha=style['alpha'], marker=',', ms=style['ms'], label=file, zorder=0.5),
+                        table, xkey, zkey)
+
+    def _plot_size_map(self, spec, file, table):
+        alpha = line_styles[spec.style]['alpha']
+        xkey, ykey, zkey = spec.columns[:3]
+        ax2 = self._twin_axes()
+        ax2.tick_params(labelright=False)
+
+        # handle axes labels
+        self.ax1.set_xlabel(label_prefix+table.name(xkey),fontsize=fontsize,labelpad=4)
+        self.ax1.set_ylabel(label_prefix+table.name(ykey),fontsize=fontsize,labelpad=4)
+
+        x = table.column(xkey)
+        y = table.column(ykey)
+        self._add_track(self.ax1.plot(x, y, linewidth=0.5, alpha=alpha, label=file), table, xkey, ykey)
+        self._size_title = label_prefix+table.name(zkey)
+        ax2.scatter(x, y, alpha=alpha, s=self._marker_size(table.column(zkey)))
+
+    def _plot_color_map(self, spec, file, table):
+        """
+            Colour-coded tracks, x:y:c or x:y:z:c with z on the twin axis. Each track is a single
+            LineCollection sharing the colour scale of the plot.
+        """
+        from matplotlib.collections import LineCollection
+        from matplotlib.lines import Line2D
+        style = line_styles[spec.style]
+        xkey, ykey, ckey = spec.columns[0], spec.columns[1], spec.columns[-1]
+        panels = [(self.ax1, ykey, multiplicator, 'solid')]
+        if len(spec.columns) > 3:
+            panels.append((self._twin_axes(), spec.columns[2], 1, 'dashed'))
+
+        # handle axes labels
+        self.ax1.set_xlabel(label_prefix+table.name(xkey),fontsize=fontsize,labelpad=4)
+        for ax, key, yscale, linestyle in panels:
+            ax.set_ylabel(label_prefix+table.name(key),fontsize=fontsize,labelpad=4)
+
+        for ax, key, yscale, linestyle in panels:
+            collection = LineCollection([], cmap=color_map, norm=self._color_norm, linewidths=style['linewidth'] or 2,
+                                        linestyles=linestyle, alpha=style['alpha'], label=file)
+            track = ColorTrack(collection, table, xkey, key, ckey, yscale=yscale)
+            # long tracks stay a single image in vector output
+            collection.set_rasterized(len(table.column(xkey)) > lod_min_points)
+            ax.add_collection(collection, autolim=False)
+            track.extend_datalim()
+            ax.autoscale_view()
+            track.refresh(self.lod, self.lod_scale)
+            self.tracks.append(track)
+            if ax is self.ax1:
+                # the collection would show in the legend in the default colour, the file is
+                # shown by a line of the colour of its median value instead
+                values = table.column(ckey)
+                value = np.nanmedian(values) if np.isfinite(values).any() else np.nan
+                self._legend_handles[collection] = Line2D([], [], color=plt.get_cmap(color_map)(self._color_norm(value)),
+                                                          linewidth=style['linewidth'] or 2, alpha=style['alpha'])
+
+    def _norm(self, tables, key):
+        value_min, value_max = column_range(tables, key)
+        if not value_max >= value_min:
+            return plt.Normalize()
+        return plt.Normalize(value_min, value_max)
+
+    def _colorbar(self, spec, tables):
+        """
+            Single colorbar of the colour map, shared by all the files.
+        """
+        from matplotlib.cm import ScalarMappable
+        name = next((table.name(spec.columns[-1]) for table in tables.values() if isinstance(table, MesaTable) and table.in_data(spec.columns[-1])), '')
+        # the space is taken from the panels only, the twin axis is moved along with ax1 below
+        # (passed to colorbar() too, it would shrink ax1 a second time)
+        colorbar = self.fig.colorbar(ScalarMappable(norm=self._color_norm, cmap=color_map), ax=self.panels, pad=0.12 if self.ax2 else 0.02)
+        if self.ax2 is not None:
+            self.ax2.set_position(self.ax1.get_position())
+        colorbar.set_label(label_prefix+name, fontsize=fontsize, labelpad=4)
+        colorbar.ax.tick_params(labelsize=labelsize)
+
+    def _marker_size(self, value):
+        # normalise values between 0 and 1 and shift to cover range 1 - 50
+        value_min, value_max = self._size_range
+        if not value_max > value_min:
+            return np.full(len(value), 25.)
+        with np.errstate(invalid='ignore'):
+            size = (value - value_min)/(value_max - value_min) * 49 + 1
+        return np.nan_to_num(size, nan=0.)
+
+    def _size_legend(self, spec):
+        """
+            Legend of the size map: a row of the marker sizes used, from the minimum to the maximum
+            of the sizing column over all the files.
+        """
+        from matplotlib.lines import Line2D
+        if not self.ax2.collections:
+            return
+        value_min, value_max = self._size_range
+        # marker sizes are areas, the legend markers take their diameter
+        color = self.ax2.collections[-1].get_facecolor()[0]
+        handles = [Line2D([], [], ls='', marker='o', ms=np.sqrt(size), alpha=0.6, color=color) for size in np.linspace(1, 50, 10)]
+        labels = ['$\\mathdefault{{%6.3f}}$' % value_min] + ['$\\mathdefault{}$']*8 + ['$\\mathdefault{{%6.3f}}$' % value_max]
+        self.ax2.legend(handles, labels, loc="center", title=self._size_title, fontsize=sizemap_label_fontsize, title_fontsize=title_fontsize, ncol=len(labels), frameon=False,
+                        bbox_to_anchor=(0.5, 1.06),markerscale=markerscale)
+
+    def _set_axes(self, spec):
+        ax1, ax2 = self.ax1, self.ax2
+        if spec.xlog: ax1.set_xscale('log')
+        for ax in self.panels:
+            if spec.ylog: ax.set_yscale('log')
+
+        if ax2 is not None:
+            if spec.ylog: ax2.set_yscale('log')
+            if spec.mode == 'us':
+                # the size map is drawn over the tracks of the primary axis
+                ax2.set_ylim(ax1.get_ylim())
+            else:
+                # set min and max bounds for yaxes
+                merge_ylim(ax1, ax2)
+                if spec.equal_ylim:
+                    ax2.set_ylim(ax1.get_ylim())
+            adjust_ylim(ax2)
+
+        xkey, ykey = spec.pairs()[0]
+        if is_inverted(xkey): ax1.invert_xaxis()
+        # the facets share the y axis of ax1
+        for ax, (xkey, ykey) in zip(self.panels if spec.mu_panels() else [ax1], spec.pairs()):
+            adjust_ylim(ax)
+            if not isinstance(ykey, str) and ykey < 0: ax.invert_yaxis()
+        if ax2 is not None and spec.mode != 'us':
+            zkey = spec.columns[2]
+            if not isinstance(zkey, str) and zkey < 0: ax2.invert_yaxis()
+
+    def _refresh_decimated(self):
+        for track in self.tracks:
+            if track.decimated:
+                track.refresh(self.lod, self.lod_scale)
+
+    def _lod_update(self):
+        """
+            Re-decimate the long tracks from their full-resolution data for the current view.
+        """
+        self._refresh_decimated()
+        self.fig.canvas.draw_idle()
+
+    def _on_lim_changed(self, ax):
+        # zooming and panning change the limits many times per second, re-decimate once they settle
+        if not any(track.decimated for track in self.tracks):
+            return
+        if self._lod_timer is None:
+            self._lod_timer = self.fig.canvas.new_timer(interval=150)
+            self._lod_timer.single_shot = True
+            self._lod_timer.add_callback(self._lod_update)
+        self._lod_timer.stop()
+        self._lod_timer.start()
+
+    def _lod_connect(self, ax):
+        """
+            Re-decimate the tracks of the axes on zoom and pan.
+        """
+        if ax is None:
+            return
+        ax.callbacks.connect('xlim_changed', self._on_lim_changed)
+        ax.callbacks.connect('ylim_changed', self._on_lim_changed)
+
+### Batch mode ###
+##################
+# Headless rendering of many plots described in a JSON manifest, either a list of plot specs
+# or {"defaults": {...}, "plots": [...]}, e.g.
+#
+#   {"defaults": {"mode": "u", "columns": "log_Teff:log_L", "options": ["-wl", "-/l"]},
+#    "plots": [{"files": ["M1.0/LOGS/history.data"], "output": "hr_M1.0.png"},
+#              {"files": ["M1.0/LOGS/history.data"], "columns": "star_age:log_R", "output": "R_M1.0.pdf"}]}
+#
+# "files" are plotted as if passed via terminal, "mode" is u/us/uc/mu (default u), "columns"
+# the x:y[:z] selection and "options" any other terminal options (e.g. -xlog, -wp, -r).
+
+def load_manifest(manifest):
+    """
+        Read a batch manifest and merge the defaults into each plot spec. A spec lacking the
+        files, the columns or the output is kept with the reason in 'error', to be reported as failed.
+
+        Returns:
+            list of the plot spec dictionaries
+    """
+    with open(manifest, 'r') as f:
+        content = json.load(f)
+    if isinstance(content, list):
+        content = {'plots': content}
+    defaults = content.get('defaults', {})
+    specs = []
+    for n, plot in enumerate(content['plots']):
+        spec = dict(defaults)
+        spec.update(plot)
+        missing = [key for key in ('files', 'columns', 'output') if not spec.get(key)]
+        if missing:
+            spec['error'] = 'plot {} of the manifest has no {}'.format(n+1, ' and no '.join('"{}"'.format(key) for key in missing))
+            spec['output'] = spec.get('output') or 'plot {}'.format(n+1)
+        elif isinstance(spec['files'], str):
+            spec['files'] = [spec['files']]
+        specs.append(spec)
+    return specs
+
+def render_spec(spec):
+    """
+        Render a single plot spec of the batch mode headlessly (Agg backend, no plt.show()).
+
+        Returns:
+            None if the plot was saved, the error message otherwise. A plot fails if any of
+            its files is missing or could not be drawn, or if no file was drawn at all
+    """
+    if 'error' in spec:
+        return spec['error']
+    plt.switch_backend('Agg')
+    columns = spec['columns']
+    if isinstance(columns, str):
+        columns = columns.split()
+    args = list(spec['files']) + [spec.get('mode', 'u')] + list(columns) + \
+           [option for option in spec.get('options', []) if not str(option).startswith('-j')]
+    fig = None
     try:
-        _existing_title = ax1.get_title()
-        if "Press [a] to refresh" not in _existing_title:
-            ax1.set_title((_existing_title + " | Press [a] to refresh").strip(" |"))
-    except Exception as _e:
-        pass
+        # parse_args() drops the arguments that are not paths, a missing file would go unnoticed
+        missing = [str(file) for file in spec['files'] if not os.path.exists(str(file))]
+        if missing:
+            return 'no such file: ' + ', '.join(missing)
+        plot, settings = parse_args(args)
+        fig = plt.figure(figsize=tuple(spec.get('figsize', (12,7))))
+        plotter = MesaPlotter(cache=settings['cache'], lod=settings['lod'], stream=settings['stream'])
+        # saved here rather than by render(), so that a failed plot is not saved
+        plotter.render(replace(plot, output=None), fig=fig)
+        if plotter.errors:
+            return '; '.join(file + ': ' + error for file, error in plotter.errors.items())
+        if not plotter.plotted:
+            return 'no file plotted'
+        plotter.save(spec['output'])
+        return None
+    except Exception as e:
+        return str(e) or e.__class__.__name__
+    finally:
+        if fig is not None:
+            plt.close(fig)
+
+def run_batch(manifest, jobs=1):
+    """
+        Render all the plots of a batch manifest using a pool of jobs worker processes.
+
+        Returns:
+            number of plots that failed
+    """
+    specs = load_manifest(manifest)
+    failed = 0
+    if jobs <= 1:
+        results = map(render_spec, specs)
+    else:
+        import concurrent.futures
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+        results = pool.map(render_spec, specs, chunksize=max(1, len(specs) // (4*jobs)))
+    try:
+        for n, (spec, error) in enumerate(zip(specs, results)):
+            if error is None:
+                print('[{}/{}] {}'.format(n+1, len(specs), spec['output']))
+            else:
+                failed += 1
+                print('[{}/{}] {} failed: {}'.format(n+1, len(specs), spec['output'], error))
+    finally:
+        if jobs > 1:
+            pool.shutdown()
+    return failed
+
+### Command line ###
+####################
+
+def print_help():
+    print('\n    MESA-plotter  \n')
+    print('      plot opt[u x:y] [lc[x,y]] \n')
+    print('      lc               filename of your light curve containing at least 2 columns ')
+    print('                       You can pass as many files to plot as you wish ')
+    print('      <u x:y:z>        specify the column numbers to plot ')
+    print('                       or expressions of the column names, e.g. u star_age:\'log10(abs(star_mdot))\' ')
+    print('      <uc x:y:c>       colour the tracks by column c (uc x:y:z:c adds z on the second y axis) ')
+    # print('       us              use size map -> plot the last column using size map ') # not working with -wl as default
+    print('      <mu x1:y1 x2:y2> plot many x:y pairs, or all the y columns of x:y1:y2:... against x ')
+    print('      -panels          with mu draw each pair in its own panel, sharing the x axis ')
+    print('      -facet=key       one panel per value of the grid parameter key parsed from the directory ')
+    print('                       names, e.g. -facet=M puts grid/M1.5/LOGS/history.data in the M = 1.5 panel ')
+    print('      -compare=kind    interpolate the x:y tracks (e.g. of -r) onto a shared x grid and plot their differences ')
+    print('                       (diff) or ratios (ratio) to the first one, or the min-max and 16-84% bands of all (band), ')
+    print('                       e.g. -r u star_age:log_L -compare=diff ')
+    print('      -stack=fname     write the x:y tracks interpolated onto the shared grid to the .npz file fname ')
+    print('      -r               pass only the directory and look for any LOGS*/history.data files therein to plot ') 
+    print('      -pattern=glob    with -r look for the files matching glob instead, e.g. -pattern=LOGS*/profile*.data (repeatable) ')
+    print('      -profiles[=sel]  plot the profiles of the passed LOGS directories picked via profiles.index, e.g. ')
+    print('                       -profiles=every:50, -profiles=model:1200,age:4.6e9 or -profiles=last (all by default). ')
+    print('                       Step through them with the left/right arrow keys ')
+    print('      -movie=fname     write a movie (.mp4 via ffmpeg, .gif) of the files, one per frame, e.g. of the -profiles selection ')
+    print('      -fps=N           frames per second of the movie (default 10) ')
+    print('      -reindex         with -r list all the directories again instead of using the index of the previous run ')
+    print('      -n               name module will print availlable data column names ')
+    print('      -n=common        with many files (e.g. -r) list only the column names found in all of them ')
+    print('      -c               add cross hair cursor to the plot ')
+    print('      -l / -/l         add / disable legend (disabled by default)')
+    print('      -wl/wp/wlp       plot using lines [default], points, lines and points, respectively')
+    print('      -xlog/ylog       adds log scale on a given axis')
+    print('      -ylim            in multiple plot mode (plotting 3 variables) set y twin ax lim same as primary y ax lim')
+    print('      -save=fname      save plot under the fname.extension. If no extension provided default to ".png" ')
+    print('      -follow[=s]      follow running models: plot the rows appended to the files every s seconds (default 2) ')
+    print('      -j N             load the files using N worker processes (all cores if N is not given) ')
+    print('      -nolod           plot the long tracks at full resolution, without decimating them to the screen resolution ')
+    print('      -binary          plot binary runs (their directories or history files), joining LOGS1/history.data, ')
+    print('                       LOGS2/history.data and binary_history.data on model_number. The columns take the prefix ')
+    print('                       1:, 2: or b:, e.g. -binary u b:age:1:log_L or -binary mu b:age:1:log_L:2:log_L ')
+    print('      -where=cond      load and plot only the rows matching cond, e.g. -where=\'center_h1<1e-4\' (repeatable) ')
+    print('      -range=key:lo:hi load and plot only the rows with lo <= key <= hi, e.g. -range=model_number:100:500 ')
+    print('      -stream          parse the files in chunks, keeping a bounded number of rows (the extremes of every column ')
+    print('                       are kept). Files larger than 1 GB are always streamed ')
+    print('      -batch=manifest  render the plots described in the JSON manifest headlessly (use with -j N) ')
+    print('      -nocache         do not use the binary column cache (kept in $MESAPLOT_CACHE_DIR, ~/.cache/MESAplot by default)')
+    print('')
+
+def parse_args(args):
+    """
+        Translate the terminal arguments into a plot spec.
 
+        Parameters:
+            args:           list of the terminal arguments, without the program name
 
+        Returns:
+            PlotSpec object and dictionary of the session settings (jobs, cache, lod,
+            stream, follow, names, batch, reindex, movie, fps, stack). ValueError is raised
+            for a column selection of less than 2 columns
+    """
+    # pick up the files to plot, without duplicates
+    files = sorted(set(str(arg) for arg in args if os.path.exists(str(arg))))
+    args = [str(arg) for arg in args if str(arg) not in files]
 
-# Add refresh interaction: press 'a' to re-load data and redraw without closing the window.
-def _on_key(event):
-    global fig, ax1, ax2
-    if event.key == 'a':
-        try:
-            if ax1: ax1.cla()
-            if ax2 is not None: ax2.cla()
-            # Keep annotations about the refresh key at the top
-            title = ax1.get_title()
-            if "Press [a] to refresh" not in title:
-                ax1.set_title((title + " | Press [a] to refresh").strip(" |"))
-            plot_all()
-            fig.canvas.draw_idle()
-        except Exception as e:
-            print(f"[refresh] Error while refreshing: {e}")
+    spec = PlotSpec(files)
+    settings = dict(jobs=1, cache=True, lod=True, stream=None, follow=None, names=False, batch=None, reindex=False, movie=None, fps=10, stack=None)
+    columns_assigned = False
+
+    for i, arg in enumerate(args):
+        if arg == '-r': spec.recursive = True
+        if arg[0:9] == '-pattern=': spec.patterns = (spec.patterns or []) + [arg[9:]]
+        if arg == '-reindex': settings['reindex'] = True
+        if arg[0:9] == '-profiles': spec.profiles = arg[10:] or 'all'
+        if arg[0:7] == '-movie=': settings['movie'] = arg[7:]
+        if arg[0:5] == '-fps=': settings['fps'] = float(arg[5:])
+        if arg == '-ylim': spec.equal_ylim = True
+        if arg == '-l': spec.legend = True
+        if arg == '-/l': spec.legend = False
+        if arg == '-c': spec.cursor = True
+        if arg == '-panels': spec.panels = True
+        if arg[0:7] == '-facet=': spec.facet = arg[7:]
+        if arg[0:9] == '-compare=':
+            if arg[9:] in compare_kinds:
+                spec.compare = arg[9:]
+            else:
+                print('\n-compare takes one of: ' + ', '.join(compare_kinds))
+        if arg[0:7] == '-stack=': settings['stack'] = arg[7:]
+        if arg[0:6] == '-where':
+            # -where=center_h1<1e-4 or -where "center_h1<1e-4"
+            condition = arg[7:] if arg[6:7] == '=' else (args[i+1] if arg == '-where' and i+1 < len(args) else '')
+            spec.where = (spec.where or []) + [condition]
+        if arg[0:7] == '-range=':
+            try:
+                spec.where = (spec.where or []) + range_conditions(arg[7:])
+            except ValueError as e:
+                print('\n' + str(e))
+        if arg == '-xlog': spec.xlog = True
+        if arg == '-ylog': spec.ylog = True
+        if arg in ('-wl', '-wp', '-wlp'): spec.style = arg[1:]
+        if arg == '-wpl': spec.style = 'wlp'
+        if arg[0:6] == '-save=': spec.output = arg[6:]
+
+        if arg == '-n': settings['names'] = True
+        if arg == '-n=common': settings['names'] = 'common'
+        if arg == '-nolod': settings['lod'] = False
+        if arg == '-stream': settings['stream'] = True
+        if arg == '-nocache': settings['cache'] = False
+        if arg[0:2] == '-j': settings['jobs'] = parse_jobs(args, i)
+        if arg[0:7] == '-batch=': settings['batch'] = arg[7:]
+        if arg[0:7] == '-follow':
+            # -follow or -follow=seconds between the reads of the new rows
+            settings['follow'] = float(arg[8:]) if try_float(arg[8:]) else 2.
+
+        if arg == '-binary': spec.binary = True
+
+        # specify which cols to plot
+        if not columns_assigned and arg in ('u', 'uc', 'us', 'mu'):
+            columns_assigned = True # overwrite control to avoid multiple column assigning
+            spec.mode = arg
+            if arg == 'mu':
+                # allow for multiple columns to be plotted, e.g. 1:2 3:4... or star_age:log_L:log_R,
+                # the condition of -where "cond" is not one of them
+                selections = [other for j, other in enumerate(args[i+1:], i+1)
+                              if is_selection(other) and args[j-1] != '-where']
+            else:
+                selections = args[i+1:i+2]
+
+    # the columns are split once -binary is known, as it changes the meaning of 1:, 2: and b:
+    if columns_assigned and spec.mode == 'mu':
+        spec.columns = [pair for selection in selections for pair in parse_pairs(selection, spec.binary)]
+    elif columns_assigned and selections:
+        spec.columns = parse_columns(selections[0], spec.binary)
+        if len(spec.columns) < 2:
+            raise ValueError('column selection ' + selections[0] + ' needs at least 2 columns' +
+                             (' (1:, 2: and b: are prefixes with -binary, e.g. 1:log_L)' if spec.binary else ''))
+
+    return spec, settings
+
+def report(plotter):
+    """
+        Print what the last render of plotter left out and the files it could not plot, once.
+    """
+    for note in plotter.notes:
+        print('\n' + note)
+    for file, error in plotter.errors.items():
+        print('\nError plotting ' + file + ' file: ' + error)
+    plotter.notes, plotter.errors = [], {}
+
+def add_refresh_hint(ax):
+    # Ensure the title mentions the refresh option
+    _existing_title = ax.get_title()
+    if "Press [a] to refresh" not in _existing_title:
+        ax.set_title((_existing_title + " | Press [a] to refresh").strip(" |"))
+
+def main(argv=None):
+    """
+        Terminal interface, see print_help().
 
-plot_all()
-# Connect key handler
-fig.canvas.mpl_connect('key_press_event', _on_key)
-### End modular wrapper ###
+        Parameters:
+            argv:           list of the terminal arguments, sys.argv[1:] by default
 
-plt.show()
+        Returns:
+            exit status
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
+        spec, settings = parse_args(argv)
+    except ValueError as e:
+        print('\n' + str(e))
+        return 1
+
+    ###### BATCH ########
+    #####################
+    if settings['batch']:
+        plt.switch_backend('Agg')
+        return 1 if run_batch(settings['batch'], jobs=settings['jobs']) else 0
+
+    ####### HELP ########
+    #####################
+    if len(argv) < 2:
+        print_help()
+        return 0
+
+    if spec.recursive and settings['reindex']:
+        # rebuild the index of the patterns actually looked for (histories, binary runs or profiles)
+        spec.plot_files(reindex=True)
+
+    ###### NAMES ########
+    #####################
+    if settings['names']:
+        # only the headers are read, however long the files are
+        files, columns = column_names(spec.plot_files(), common=settings['names'] == 'common')
+        if not files:
+            print("No valid files found to display column names.")
+            return 0
+        lines = name_lines(files, columns)
+        if not sys.stdout.isatty():
+            # piped, e.g. into grep
+            print('\n'.join(lines))
+            return 0
+        if len(files) == 1:
+            source = '{} file'.format(files[0])
+        else:
+            source = '{} files ({})'.format(len(files), 'common columns' if settings['names'] == 'common' else 'all columns')
+        import curses
+        curses.wrapper(data_names, source, lines)
+        return 0
 
+    plotter = MesaPlotter(cache=settings['cache'], jobs=settings['jobs'], lod=settings['lod'], stream=settings['stream'])
+
+    ###### MOVIE ########
+    #####################
+    if settings['movie']:
+        plt.switch_backend('Agg')
+        try:
+            frames = plotter.animate(spec, settings['movie'], fps=settings['fps'])
+        except RuntimeError as e:
+            print(e)
+            return 1
+        report(plotter)
+        print('{} frames written to {}'.format(frames, settings['movie']))
+        return 0
+
+    plotter.render(spec)
+    report(plotter)
+    add_refresh_hint(plotter.ax1)
+
+    if settings['stack']:
+        stack = plotter.stack(spec)
+        stack.save(settings['stack'])
+        print('{} tracks of {} points written to {}'.format(*stack.values.shape, settings['stack']))
+
+    # Add refresh interaction: press 'a' to re-load data and redraw without closing the window.
+    # The arrow keys step through the selected profiles.
+    def on_key(event):
+        if event.key == 'a':
+            try:
+                plotter.refresh()
+                report(plotter)
+                add_refresh_hint(plotter.ax1)
+            except Exception as e:
+                print(f"[refresh] Error while refreshing: {e}")
+        if event.key in ('right', 'left'):
+            try:
+                plotter.step(1 if event.key == 'right' else -1)
+                report(plotter)
+            except Exception as e:
+                print(f"[profiles] Error while stepping: {e}")
+    plotter.fig.canvas.mpl_connect('key_press_event', on_key)
+
+    # tail-follow the files of running models
+    if settings['follow']:
+        follow_timer = plotter.fig.canvas.new_timer(interval=int(settings['follow']*1000))
+        def follow():
+            plotter.update()
+            report(plotter)
+        follow_timer.add_callback(follow)
+        follow_timer.start()
+
+    plt.show()
+    return 0
+
+### Main ###
+############
+# the script part is guarded, so that the worker processes of the loading pool
+# (which re-import this file on spawn-based platforms) do not plot anything
+if __name__ == '__main__':
+    sys.exit(main())